@@ -12,6 +12,10 @@ from electiondata import (
     multielection as multi,
     constants,
 )
+import concurrent.futures
+import multiprocessing
+import psycopg2
+import queue
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.session import Session, engine
 from typing import List, Dict, Optional, Any, Tuple, Union, Iterable
@@ -24,6 +28,7 @@ from pathlib import Path
 import xml.etree.ElementTree as ET
 import itertools
 import shutil
+import threading
 import json
 
 # nb: jurisdiction_path is for backward compatibility
@@ -136,9 +141,25 @@ class SingleDataLoader:
             jurisdiction_id,
             election_id,
             self.d["is_preliminary"],
+            content_hash=self.content_hash(),
         )
         return datafile_id, election_id, err
 
+    def content_hash(self) -> Optional[str]:
+        """
+        Returns:
+            Optional[str], hash of the contents of the results file, its munger files and the
+                jurisdiction's dictionary (or None if any of them cannot be read)
+        """
+        return ui.results_content_hash(
+            os.path.join(self.results_dir, self.d["results_file"]),
+            [
+                os.path.join(self.mungers_path, f"{mu}.munger")
+                for mu in self.munger_list
+            ],
+            os.path.join(self.path_to_jurisdiction_dir, "dictionary.txt"),
+        )
+
     def load_results(
         self, rollup: bool = False, rollup_rut: Optional[str] = None
     ) -> Optional[dict]:
@@ -148,42 +169,13 @@ class SingleDataLoader:
             rollup_rut: Optional[str] = None, subdivision type to roll up to (typically 'county')
 
         Load results from the file referenced in self.param_file
+            (munging with the next munger while the previous munger's results are inserted,
+            see load_results_pipelined)
 
         Returns:
             Optional[dict], error dictionary
         """
-        err = None
-        print(f'\n\nProcessing {self.d["results_file"]}')
-
-        # Enter datafile info to db and collect _datafile_Id and Election_Id
-        datafile_id, election_id, new_err = self.track_results()
-        if new_err:
-            err = ui.consolidate_errors([err, new_err])
-            return err
-
-        else:
-            constants = self.collect_constants_from_ini()
-
-            # load results to db
-            for mu in self.munger_list:
-                print(f"\twith munger {mu}")
-                f_path = os.path.join(self.results_dir, self.d["results_file"])
-                mu_path = os.path.join(self.mungers_path, f"{mu}.munger")
-                new_err = load_results_file(
-                    self.session,
-                    mu_path,
-                    f_path,
-                    self.juris_true_name,
-                    datafile_id,
-                    election_id,
-                    constants,
-                    self.results_dir,
-                    self.path_to_jurisdiction_dir,
-                    rollup=rollup,
-                    rollup_rut=rollup_rut,
-                )
-                if new_err:
-                    err = ui.consolidate_errors([err, new_err])
+        [err] = load_results_pipelined([(self, rollup_rut)], rollup=rollup)
         return err
 
     def collect_constants_from_ini(self) -> dict:
@@ -308,6 +300,8 @@ class DataLoader:
 
         Returns DataLoader instance with attributes:
             d, dictionary of parameters from param_file
+            param_file, path to the parameter file
+            major_subdivision_file, path to the major subdivision file (or None)
             db_engine, sqlalchemy engine connecting to postgres database specified in param_file
             session, sqlalchemy session for interacting with the database
             analyzer, Analyzer instance for exporting or analyzing data in the database,
@@ -316,6 +310,9 @@ class DataLoader:
         # default param_file is run_time.ini in current directory
         if not param_file:
             param_file = "run_time.ini"
+        # keep for worker processes, which create their own DataLoader
+        self.param_file = param_file
+        self.major_subdivision_file = major_subdivision_file
 
         # grab parameters
         self.d, self.parameter_err = ui.get_parameters(
@@ -350,12 +347,14 @@ class DataLoader:
         dbname: Optional[str] = None,
         db_param_file: Optional[str] = None,
         db_params: Optional[Dict[str, str]] = None,
+        search_path: Optional[str] = None,
     ):
         """
         Inputs:
             dbname: Optional[str] = None,
             db_param_file: Optional[str] = None,
             db_params: Optional[Dict[str, str]] = None,
+            search_path: Optional[str] = None, schemas to search for unqualified table names
 
             Sets engine attribute to an open connection with the database specified by
                 dname and/or db_params and/or db_param_file, and sets session attribute
@@ -363,7 +362,10 @@ class DataLoader:
         """
         try:
             self.db_engine, err = db.sql_alchemy_connect(
-                db_param_file=db_param_file, dbname=dbname, db_params=db_params
+                db_param_file=db_param_file,
+                dbname=dbname,
+                db_params=db_params,
+                search_path=search_path,
             )
             Session = sessionmaker(bind=self.db_engine)
             self.session = Session()
@@ -445,6 +447,28 @@ class DataLoader:
         self.analyzer.session = self.session
         return err
 
+    def set_search_path(self, search_path: Optional[str] = None):
+        """
+        Input:
+            search_path: Optional[str] = None, comma-separated list of schemas to search for
+                unqualified table names (e.g., 'staging,public'); if None, the database default
+
+        Closes self.session, then redefines self.db_engine and self.session (and self.analyzer.session)
+            to connect to the same database with the given search path
+        """
+        db_params = {
+            "host": self.db_engine.url.host,
+            "port": self.db_engine.url.port,
+            "user": self.db_engine.url.username,
+            "password": self.db_engine.url.password,
+            "dbname": self.db_engine.url.database,
+        }
+        self.session.close()
+        self.connect_to_db(db_params=db_params, search_path=search_path)
+        self.analyzer.session.close()
+        self.analyzer.session = self.session
+        return
+
     def close_and_erase(self) -> Optional[dict]:
         """
         Closes and removes the database specified by self.engine. Creates new engine and session
@@ -522,6 +546,35 @@ class DataLoader:
                 (or None if fatal error occurred)
              Optional[dict], error dictionary
         """
+        sdl, rollup_rut, err = self.prepare_one_from_ini(
+            ini_path, path_to_jurisdiction_dir, juris_true_name, rollup=rollup
+        )
+        if ui.fatal_error(err):
+            return None, err
+        load_error = sdl.load_results(rollup=rollup, rollup_rut=rollup_rut)
+        err = ui.consolidate_errors([err, load_error])
+        return sdl, err
+
+    def prepare_one_from_ini(
+        self,
+        ini_path: str,
+        path_to_jurisdiction_dir: str,
+        juris_true_name: str,
+        rollup: bool = False,
+    ) -> (Optional[SingleDataLoader], Optional[str], Optional[dict]):
+        """
+        Inputs:
+            ini_path: str, path to file with parameters describing single results file
+            path_to_jurisdiction_dir: str, path to directory holding the jurisdiction's files
+            juris_true_name: str, name of jurisdiction (with spaces, not strings)
+            rollup: bool = False, if True, finds major subdivision type for rollup
+
+        Returns:
+             Optional[SingleDataLoader], SingleDataLoader object for the results file specified
+                by the parameters in <ini_path> (or None if fatal error occurred)
+             Optional[str], ReportingUnitType to roll up to (None if no rollup)
+             Optional[dict], error dictionary
+        """
         sdl, err = check_and_init_singledataloader(
             self.d["results_dir"],
             ini_path,
@@ -531,7 +584,7 @@ class DataLoader:
             path_to_jurisdiction_dir,
         )
         if ui.fatal_error(err):
-            return None, err
+            return None, None, err
         elif sdl is None:
             err = ui.add_new_error(
                 err,
@@ -539,7 +592,7 @@ class DataLoader:
                 Path(ini_path).stem,
                 f"Unexpected failure to load data (no SingleDataLoader object created)",
             )
-            return None, err
+            return None, None, err
         # TODO check for file problems discernible before loading?
 
         # get rollup unit if required
@@ -557,9 +610,7 @@ class DataLoader:
 
         else:
             rollup_rut = None
-        load_error = sdl.load_results(rollup=rollup, rollup_rut=rollup_rut)
-        err = ui.consolidate_errors([err, load_error])
-        return sdl, err
+        return sdl, rollup_rut, err
 
     def load_ej_pair(
         self,
@@ -583,6 +634,8 @@ class DataLoader:
         Looks within ini_files_for_results/<jurisdiction> for
         all ini files matching  given election and jurisdiction.
         For each, attempts to load file if it exists; reports missing data files.
+        Each file is munged (in a separate thread) while the results of the previous file are
+        inserted into the db (see load_results_pipelined).
         If files load successfully without fatal error and <run_tests> is True, runs tests on the loaded results
             and reports any failures to error report
         Returns
@@ -594,6 +647,8 @@ class DataLoader:
         err = None
         success_by_ini = list()
         failure_by_ini = list()
+        # (ini file name, SingleDataLoader, rollup ReportingUnitType) for files to load
+        to_load = list()
         latest_download_date = "0000-00-00"
         juris_system_name = jm.system_name_from_true_name(juris_true_name)
         path_to_jurisdiction_dir = os.path.join(
@@ -634,20 +689,18 @@ class DataLoader:
                                 )
                             continue
 
-                        sdl, load_error = self.load_one_from_ini(
+                        sdl, rollup_rut, prep_error = self.prepare_one_from_ini(
                             ini_path,
                             path_to_jurisdiction_dir,
                             juris_true_name,
                             rollup=rollup,
                         )
-                        if ui.fatal_error(load_error):
+                        if prep_error:
+                            err = ui.consolidate_errors([err, prep_error])
+                        if ui.fatal_error(prep_error):
                             failure_by_ini.append(ini)
                         else:
-                            success_by_ini.append(ini)
-                            if latest_download_date < sdl.d["results_download_date"]:
-                                latest_download_date = sdl.d["results_download_date"]
-                        if load_error:
-                            err = ui.consolidate_errors([err, load_error])
+                            to_load.append((ini, sdl, rollup_rut))
 
                     else:
                         err = ui.add_new_error(
@@ -656,6 +709,21 @@ class DataLoader:
                             ini,
                             f"Ini in subdirectory {ini_subdir} has non-matching jurisdiction: {params['jurisdiction']}",
                         )
+
+        # load the files, munging each while the previous one is inserted into the db
+        load_errors = load_results_pipelined(
+            [(sdl, rollup_rut) for (_, sdl, rollup_rut) in to_load], rollup=rollup
+        )
+        for (ini, sdl, _), load_error in zip(to_load, load_errors):
+            if ui.fatal_error(load_error):
+                failure_by_ini.append(ini)
+            else:
+                success_by_ini.append(ini)
+                if latest_download_date < sdl.d["results_download_date"]:
+                    latest_download_date = sdl.d["results_download_date"]
+            if load_error:
+                err = ui.consolidate_errors([err, load_error])
+
         # add totals if necessary
         add_err = self.add_totals_if_missing(election, juris_true_name)
         if add_err:
@@ -670,6 +738,79 @@ class DataLoader:
                 err = ui.consolidate_errors([err, new_err])
         return success_by_ini, failure_by_ini, latest_download_date, err
 
+    def load_juris_elections(
+        self,
+        jurisdiction: str,
+        elections: List[str],
+        rollup: bool = False,
+        report_missing_files: bool = False,
+        run_tests: bool = True,
+    ) -> (
+        Dict[str, List[str]],
+        Dict[str, List[str]],
+        Dict[str, bool],
+        str,
+        Optional[dict],
+    ):
+        """
+        Inputs:
+            jurisdiction: str, name of jurisdiction
+            elections: List[str], elections whose results for <jurisdiction> should be loaded
+            rollup: bool = False, if True, loads results rolled up to major subdivision
+            report_missing_files: bool = False, if True, reports files referenced in .ini files
+                but not found in results directory
+            run_tests: bool = True, if false, do not run tests on loaded data
+
+        Loads each election-jurisdiction pair in turn (see load_ej_pair)
+        Returns:
+            Dict[str, List[str]], for each e-j pair, a list of files loading successfully
+            Dict[str, List[str]], for each e-j pair, a list of files that failed to load
+            Dict[str, bool], for each e-j pair, True if no files failed and all tests passed
+            str, latest download date of files for the last election loaded
+            Optional[dict], error dictionary
+        """
+        juris_err = None
+        successfully_loaded = dict()
+        failed_to_load = dict()
+        all_tests_passed = dict()
+        latest_download_date = "0000-00-00"
+        for election in elections:
+            # load the relevant files
+            (
+                success_list,
+                failure_list,
+                latest_download_date,
+                new_err,
+            ) = self.load_ej_pair(
+                election,
+                jurisdiction,
+                rollup=rollup,
+                report_missing_files=report_missing_files,
+                run_tests=run_tests,
+            )
+            if new_err:
+                juris_err = ui.consolidate_errors([juris_err, new_err])
+
+            # set all_test_passed boolean for this e-j pair
+            if not run_tests:
+                all_tests_passed[f"{election};{jurisdiction}"] = True
+            elif failure_list or (
+                new_err and ("warn-test" in new_err.keys()) and new_err["warn-test"]
+            ):
+                all_tests_passed[f"{election};{jurisdiction}"] = False
+            else:
+                all_tests_passed[f"{election};{jurisdiction}"] = True
+
+            successfully_loaded[f"{election};{jurisdiction}"] = success_list
+            failed_to_load[f"{election};{jurisdiction}"] = failure_list
+        return (
+            successfully_loaded,
+            failed_to_load,
+            all_tests_passed,
+            latest_download_date,
+            juris_err,
+        )
+
     def load_all(
         self,
         report_dir: Optional[str] = None,
@@ -681,6 +822,7 @@ class DataLoader:
         report_missing_files: bool = False,
         run_tests: bool = True,
         suppress_warnings: bool = False,
+        processes: int = constants.results_load_processes,
     ) -> (Dict[str, List[str]], Dict[str, List[str]], Dict[str, bool], Optional[dict]):
         """
         Inputs:
@@ -696,6 +838,9 @@ class DataLoader:
             run_tests: bool = True, if false, do not run tests on loaded data
             suppress_warnings: bool = False, if True, report only errors
                 to directory specified by self.d["reports_and_plots_dir"]
+            processes: int = constants.results_load_processes, maximum number of worker processes
+                loading results; each worker has its own database connection and loads all
+                the elections for any jurisdiction it is given
 
         Processes all results (or all results corresponding to pairs in
         ej_list if given) in DataLoader's results directory using
@@ -806,68 +951,43 @@ class DataLoader:
             )
             ok_jurisdictions = jurisdictions
 
+        # load results, jurisdictions in parallel if possible
+        juris_results, new_err = load_juris_elections_in_parallel(
+            self,
+            ok_jurisdictions,
+            elections,
+            rollup=rollup,
+            report_missing_files=report_missing_files,
+            run_tests=run_tests,
+            processes=processes,
+        )
+        err = ui.consolidate_errors([err, new_err])
+
         latest_download_date = dict()
         for jurisdiction in ok_jurisdictions:
             juris_system_name = jm.system_name_from_true_name(jurisdiction)
-            juris_err = None
-            for election in elections[jurisdiction]:
-                # load the relevant files
-                (
-                    success_list,
-                    failure_list,
-                    latest_download_date[jurisdiction],
-                    new_err,
-                ) = self.load_ej_pair(
-                    election,
-                    jurisdiction,
-                    rollup=rollup,
-                    report_missing_files=report_missing_files,
-                    run_tests=run_tests,
-                )
-                if new_err:
-                    juris_err = ui.consolidate_errors([juris_err, new_err])
-
-                # set all_test_passed boolean for this e-j pair
-                if not run_tests:
-                    all_tests_passed[f"{election};{jurisdiction}"] = True
-                elif failure_list or (
-                    new_err and ("warn-test" in new_err.keys()) and new_err["warn-test"]
-                ):
-                    all_tests_passed[f"{election};{jurisdiction}"] = False
-                else:
-                    all_tests_passed[f"{election};{jurisdiction}"] = True
-
-                successfully_loaded[f"{election};{jurisdiction}"] = success_list
-                failed_to_load[f"{election};{jurisdiction}"] = failure_list
+            if jurisdiction not in juris_results.keys():
+                continue
+            (
+                juris_success,
+                juris_failure,
+                juris_tests_passed,
+                latest_download_date[jurisdiction],
+                juris_err,
+            ) = juris_results[jurisdiction]
+            successfully_loaded.update(juris_success)
+            failed_to_load.update(juris_failure)
+            all_tests_passed.update(juris_tests_passed)
 
             if move_files:
                 # if all existing files referenced in any results.ini
                 # for the jurisdiction
                 # -- for any election -- loaded correctly
                 if not ui.fatal_error(juris_err):
-                    juris_results_path = os.path.join(
-                        self.d["results_dir"], juris_system_name
+                    new_err = self.archive_juris_results(
+                        juris_system_name, latest_download_date[jurisdiction]
                     )
-                    # copy the jurisdiction's results file to archive directory
-                    # (subdir named with latest download date; if exists already, create backup with timestamp)
-                    if os.path.isdir(juris_results_path):
-                        new_err = ui.copy_directory_with_backup(
-                            juris_results_path,
-                            os.path.join(
-                                self.d["archive_dir"],
-                                f"{juris_system_name}_{latest_download_date[jurisdiction]}",
-                            ),
-                            report_error=False,
-                        )
-                        err = ui.consolidate_errors([err, new_err])
-                        # remove jurisdiction's results file from results directory
-                        shutil.rmtree(juris_results_path)
-                    else:
-                        print(
-                            f"Directory not copied, because not found: {juris_results_path}\n"
-                            f"This may be caused by having results for two different elections"
-                            f"in the directory."
-                        )
+                    err = ui.consolidate_errors([err, new_err])
 
             err = ui.consolidate_errors([err, juris_err])
 
@@ -889,6 +1009,41 @@ class DataLoader:
 
         return successfully_loaded, failed_to_load, all_tests_passed, err
 
+    def archive_juris_results(
+        self, juris_system_name: str, download_date: str
+    ) -> Optional[dict]:
+        """
+        Inputs:
+            juris_system_name: str, name of jurisdiction's subdirectory of results directory
+            download_date: str, latest download date of the jurisdiction's results files
+
+        Copies the jurisdiction's results files to a subdirectory of self.d["archive_dir"]
+            named with <download_date> (if exists already, creates backup with timestamp),
+            then removes them from the results directory
+        Returns:
+            Optional[dict], error dictionary
+        """
+        err = None
+        juris_results_path = os.path.join(self.d["results_dir"], juris_system_name)
+        if os.path.isdir(juris_results_path):
+            err = ui.copy_directory_with_backup(
+                juris_results_path,
+                os.path.join(
+                    self.d["archive_dir"],
+                    f"{juris_system_name}_{download_date}",
+                ),
+                report_error=False,
+            )
+            # remove jurisdiction's results file from results directory
+            shutil.rmtree(juris_results_path)
+        else:
+            print(
+                f"Directory not copied, because not found: {juris_results_path}\n"
+                f"This may be caused by having results for two different elections"
+                f"in the directory."
+            )
+        return err
+
     def strip_dates_from_results_folders(self) -> Dict[str, str]:
         """
         Remove any date-suffixes from sub-folders of self.d["results_dir"]
@@ -1011,6 +1166,18 @@ class DataLoader:
                     f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
                 )
                 err = ui.consolidate_errors([err, new_err])
+                # update rolled-up counts for datafiles with new total records
+                err_str = db.refresh_rollup_for_datafiles(
+                    self.session.bind, m_df["_datafile_Id"].unique()
+                )
+                if err_str:
+                    # vote counts are loaded, so failure of rollup is not fatal
+                    err = ui.add_new_error(
+                        err,
+                        "warn-system",
+                        f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
+                        err_str,
+                    )
             except Exception as exc:
                 err = ui.add_new_error(
                     err,
@@ -1447,18 +1614,14 @@ class DataLoader:
                 continue  # go to next munger
             # collect election-jurisdiction pairs
             new_err = dict()
-            dictionary_df = pd.read_csv(
-                dictionary_path,
-                sep="\t",
-            )
+            dictionary = m.compiled_dictionary(dictionary_path)
             for element in ["Jurisdiction", "Election"]:
                 working, new_err[element] = m.replace_raw_with_internal_name(
                     working,
                     munger,
                     multi_file_name,
                     element,
-                    dictionary_df,
-                    dictionary_path,
+                    dictionary,
                     drop_unmatched=True,
                 )
             # use multi-file's dictionary to get internal names of election and jurisdiction
@@ -2457,8 +2620,9 @@ class Analyzer:
             print(err_str)
             return None
 
-        if db_engine:
-            db_engine.dispose()
+        # NB: db_engine is the engine shared by everything connected to this db (see db.sql_alchemy_connect),
+        #  so it is not disposed of here; session just returns its connection to the pool.
+        session.close()
         return super().__new__(cls)
 
     def __init__(
@@ -2617,22 +2781,8 @@ class Analyzer:
             # data doesn't exist
             return False
 
-        # read all contests with records in the VoteCount table
-        df = db.read_vote_count(
-            self.session,
-            election_id=election_id,
-            jurisdiction_id=jurisdiction_id,
-            fields=["ContestName"],
-            aliases=["contest_name"],
-        )
-        # if no contest found
-        if df.empty:
-            # no data exists.
-            return False
-        # otherwise
-        else:
-            # then data exists!
-            return True
+        # look for any record in the VoteCount table
+        return db.vote_counts_exist(self.session, election_id, jurisdiction_id)
 
     def check_totals_match_vote_types(
         self,
@@ -3074,8 +3224,18 @@ class Analyzer:
         else:
             jurisdiction_id = None
 
-        # get counts
-        df = db.read_vote_count(
+        # get counts, sorted in db, a chunk at a time
+        aliases = [
+            "Election",
+            "Contest",
+            "Selection",
+            "Party",
+            "ReportingUnit",
+            "VoteType",
+            "Count",
+            "Preliminary",
+        ]
+        chunks = db.read_vote_count_chunks(
             self.session,
             election_id=election_id,
             jurisdiction_id=jurisdiction_id,
@@ -3089,23 +3249,25 @@ class Analyzer:
                 "Count",
                 "is_preliminary",
             ],
-            aliases=[
-                "Election",
-                "Contest",
-                "Selection",
-                "Party",
-                "ReportingUnit",
-                "VoteType",
-                "Count",
-                "Preliminary",
+            aliases=aliases,
+            order_by=[
+                "ElectionName",
+                "ContestName",
+                "BallotName",
+                "GPReportingUnitName",
+                "CountItemType",
             ],
         )
         #  export to file
-        df.sort_values(
-            by=["Election", "Contest", "Selection", "ReportingUnit", "VoteType"],
-            inplace=True,
-        )
-        df.to_csv(target_file, sep="\t", index=False)
+        mode = "w"
+        for df in chunks:
+            df.to_csv(
+                target_file, sep="\t", index=False, header=(mode == "w"), mode=mode
+            )
+            mode = "a"
+        if mode == "w":
+            # no counts found; write header only
+            pd.DataFrame(columns=aliases).to_csv(target_file, sep="\t", index=False)
         return
 
     def diff_in_diff_dem_vs_rep(
@@ -3802,19 +3964,8 @@ def external_data_exists(
         # data doesn't exist
         return False
 
-    connection = an.session.bind.raw_connection()
-    cursor = connection.cursor()
-    df = db.read_external_cursor(cursor, election_id, jurisdiction_id, ["Label"])
-    cursor.close()
-
-    # if no data found
-    if df.empty:
-        # no data exists.
-        return False
-    # otherwise
-    else:
-        # then data exists!
-        return True
+    # look for any external data record
+    return db.external_data_exists(an.session, election_id, jurisdiction_id)
 
 
 def load_results_df(
@@ -3830,6 +3981,7 @@ def load_results_df(
     rollup: bool = False,
     rollup_rut: str = constants.default_subdivision_type,
     alt_dictionary: Optional[str] = None,
+    dictionary: Optional[m.CompiledDictionary] = None,
 ) -> Optional[dict]:
     """
     Required inputs:
@@ -3846,15 +3998,70 @@ def load_results_df(
         rollup: bool = False,
         rollup_rut: str = constants.default_subdivision_type,
         alt_dictionary: Optional[str] = None,  path to file
+        dictionary: Optional[m.CompiledDictionary] = None, already-compiled dictionary
 
-    Munges vote counts in dataframe into the <session>'s database, using the dictionary.txt file in the
-        <path_to_jurisdiction_dir> directory or, if given, the file specified by <alt_dictionary>. If
+    Munges vote counts in dataframe into the <session>'s database, using <dictionary> if given, otherwise
+        the dictionary.txt file in the <path_to_jurisdiction_dir> directory or, if given, the file specified
+        by <alt_dictionary>. If
         <rollup> then results are rolled up to the ReportingUnitType <rollup_rut> if given; the default is
          <constants.default_subdivision_type>.
 
     Returns:
          Optional[dict], error dictionary
     """
+    # one connection and one transaction for all inserts into the db, so that
+    #  a failed load leaves no partial results
+    connection = session.bind.raw_connection()
+    try:
+        err = load_results_df_with_connection(
+            session,
+            connection,
+            df,
+            necessary_constants,
+            juris_true_name,
+            file_name,
+            munger_name,
+            path_to_jurisdiction_dir,
+            datafile_id,
+            election_id,
+            rollup=rollup,
+            rollup_rut=rollup_rut,
+            alt_dictionary=alt_dictionary,
+            dictionary=dictionary,
+        )
+        if ui.fatal_error(err):
+            connection.rollback()
+        else:
+            connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    # new Selection and CandidateSelection records are now visible to other connections
+    db.invalidate_name_id_cache(session.bind, "Selection")
+    db.invalidate_name_id_cache(session.bind, "CandidateSelection")
+    return err
+
+
+def load_results_df_with_connection(
+    session: Session,
+    connection: psycopg2.extensions.connection,
+    df: pd.DataFrame,
+    necessary_constants: dict,
+    juris_true_name: str,
+    file_name: str,
+    munger_name: str,
+    path_to_jurisdiction_dir: str,
+    datafile_id: int,
+    election_id: int,
+    rollup: bool = False,
+    rollup_rut: str = constants.default_subdivision_type,
+    alt_dictionary: Optional[str] = None,
+    dictionary: Optional[m.CompiledDictionary] = None,
+) -> Optional[dict]:
+    """Does the work of load_results_df, with all inserts made via <connection>,
+    none of them committed"""
     err = None
     working = df.copy()
     # add text column for internal CountItemType name, Id columns for all but Count, removing raw-munged
@@ -3867,6 +4074,8 @@ def load_results_df(
             munger_name,
             session,
             alternate_dictionary=alt_dictionary,
+            connection=connection,
+            dictionary=dictionary,
         )
         if new_err:
             err = ui.consolidate_errors([err, new_err])
@@ -3883,7 +4092,12 @@ def load_results_df(
 
     # # for each contest, if none or unknown candidate has total votes 0, remove rows with that contest & candidate
     nou_candidate_id = db.name_to_id(session, "Candidate", "none or unknown")
-    nou_selection_ids = db.selection_ids_from_candidate_id(session, nou_candidate_id)
+    # NB: use <connection>, to see any CandidateSelections inserted (but not yet committed) above
+    cursor = connection.cursor()
+    nou_selection_ids = db.selection_ids_from_candidate_id_cursor(
+        cursor, nou_candidate_id
+    )
+    cursor.close()
     unknown = (
         working[working.Selection_Id.isin(nou_selection_ids)]
         .groupby(["Contest_Id", "Selection_Id"])
@@ -3922,7 +4136,20 @@ def load_results_df(
     working = m.add_constant_column(working, "Election_Id", election_id)
     # load counts to db
     try:
-        err = m.fill_vote_count(working, session, munger_name, err)
+        err = m.fill_vote_count(
+            working, session, munger_name, err, connection=connection
+        )
+        if not ui.fatal_error(err):
+            # update rolled-up counts for this datafile
+            err_str = db.refresh_rollup(connection, datafile_id)
+            if err_str:
+                # vote counts are loaded, so failure of rollup is not fatal
+                err = ui.add_new_error(
+                    err,
+                    "warn-system",
+                    f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
+                    err_str,
+                )
     except Exception as exc:
         err = ui.add_new_error(
             err,
@@ -3934,6 +4161,197 @@ def load_results_df(
     return err
 
 
+def munge_results_file(
+    munger_path: str,
+    f_path: str,
+    constants: Dict[str, str],
+    results_directory_path: str,
+) -> (Optional[pd.DataFrame], dict, Optional[dict]):
+    """
+    required inputs:
+        munger_path: str, path to file with munging parameters
+        f_path: str, path to results file
+        constants: Dict[str, str], values of any elements (e.g., CountItemType) constant over the results file
+        results_directory_path: str, path to root directory for results files
+
+    Reads results file into a dataframe of raw munged values, ready for load_results_df.
+        Does not use the database.
+
+    returns:
+        Optional[pd.DataFrame], dataframe of raw values, with Count column (None if fatal error)
+        dict, constants needed by the munger
+        Optional[dict], error dictionary
+    """
+    # TODO tech debt: redundant to pass results_directory_path and f_path
+    necessary_constants = dict()
+    # read parameters from munger file
+    p, err = m.get_and_check_munger_params(munger_path)
+    if ui.fatal_error(err):
+        return None, necessary_constants, err
+
+    # transform to raw df in standard form
+    df, new_err = m.file_to_raw_df(munger_path, p, f_path, results_directory_path)
+    if new_err:
+        err = ui.consolidate_errors([err, new_err])
+        if ui.fatal_error(new_err):
+            return None, necessary_constants, err
+
+    # # add columns for constant-over-file elements
+    if p["constant_over_file"]:
+        necessary_constants = {
+            c: v for c, v in constants.items() if c in p["constant_over_file"]
+        }
+        df = m.add_constants_to_df(df, necessary_constants)
+
+    # # delete any rows with items to be ignored
+    df = m.remove_ignored_rows(df, munger_path)
+    return df, necessary_constants, err
+
+
+def munge_results_files_in_thread(
+    jobs: List[Tuple[int, str, str, Dict[str, str], str]],
+    pending: queue.Queue,
+    stop: threading.Event,
+):
+    """Munges results files as specified by <jobs>, each a tuple
+    (file number, munger_path, f_path, constants, results_directory_path), in turn, putting
+    (file number, munger_path, df, necessary_constants, err) on the bounded queue <pending>,
+    followed by None. Stops early if <stop> is set."""
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    for file_number, mu_path, f_path, constants, results_directory_path in jobs:
+        if stop.is_set():
+            return
+        try:
+            df, necessary_constants, err = munge_results_file(
+                mu_path, f_path, constants, results_directory_path
+            )
+        except Exception as exc:
+            df, necessary_constants = None, dict()
+            err = ui.add_new_error(
+                None,
+                "munger",
+                Path(mu_path).stem,
+                f"Exception while munging {Path(f_path).name}: {exc}",
+            )
+        put((file_number, mu_path, df, necessary_constants, err))
+    put(None)
+
+
+def load_results_pipelined(
+    sdl_list: List[Tuple[SingleDataLoader, Optional[str]]],
+    rollup: bool = False,
+) -> List[Optional[dict]]:
+    """
+    required inputs:
+        sdl_list: List[Tuple[SingleDataLoader, Optional[str]]], SingleDataLoader for each
+            results file to load, with the ReportingUnitType to roll its results up to (if any)
+    optional inputs:
+        rollup: bool = False, if True, roll results up before inserting in db
+
+    Loads each results file with each of its mungers, files in order. Munging runs ahead
+        in a separate thread, so that the next munger (of the same file, or of the next file)
+        is applied while the dataframe from the previous munger is inserted into the db.
+        At most electiondata.constants.pending_munged_frames munged dataframes wait for
+        insertion at any time. As with each file loaded alone, a file's results are not
+        inserted if its record cannot be entered in the _datafile table.
+
+    returns:
+        List[Optional[dict]], error dictionary for each file in <sdl_list>
+    """
+    errs = [None for _ in sdl_list]
+    jobs = list()
+    for file_number, (sdl, _) in enumerate(sdl_list):
+        f_path = os.path.join(sdl.results_dir, sdl.d["results_file"])
+        file_constants = sdl.collect_constants_from_ini()
+        for mu in sdl.munger_list:
+            mu_path = os.path.join(sdl.mungers_path, f"{mu}.munger")
+            jobs.append(
+                (file_number, mu_path, f_path, file_constants, sdl.results_dir)
+            )
+
+    # compile each jurisdiction's dictionary once for all files and mungers
+    dictionaries = dict()
+    pending = queue.Queue(maxsize=electiondata.constants.pending_munged_frames)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=munge_results_files_in_thread,
+        args=(jobs, pending, stop),
+        daemon=True,
+    )
+    producer.start()
+    current = None
+    skip_file = False
+    datafile_id, election_id, dictionary = 0, 0, None
+    try:
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            file_number, mu_path, df, necessary_constants, new_err = item
+            sdl, rollup_rut = sdl_list[file_number]
+            if file_number != current:
+                # first munger of a new file: enter datafile info to db
+                current = file_number
+                print(f'\n\nProcessing {sdl.d["results_file"]}')
+                datafile_id, election_id, track_err = sdl.track_results()
+                skip_file = bool(track_err)
+                if track_err:
+                    errs[file_number] = ui.consolidate_errors(
+                        [errs[file_number], track_err]
+                    )
+                else:
+                    dictionary_path = os.path.join(
+                        sdl.path_to_jurisdiction_dir, "dictionary.txt"
+                    )
+                    try:
+                        if dictionary_path not in dictionaries.keys():
+                            dictionaries[dictionary_path] = m.compiled_dictionary(
+                                dictionary_path
+                            )
+                        dictionary = dictionaries[dictionary_path]
+                    except Exception as exc:
+                        errs[file_number] = ui.add_new_error(
+                            errs[file_number],
+                            "jurisdiction",
+                            sdl.juris_system_name,
+                            f"Unable to read dictionary file {dictionary_path}: {exc}",
+                        )
+                        skip_file = True
+            if skip_file:
+                continue
+            print(f"\twith munger {Path(mu_path).stem}")
+            if not ui.fatal_error(new_err):
+                load_err = load_results_df(
+                    sdl.session,
+                    df,
+                    necessary_constants,
+                    sdl.juris_true_name,
+                    Path(sdl.d["results_file"]).name,
+                    Path(mu_path).name,
+                    sdl.path_to_jurisdiction_dir,
+                    datafile_id,
+                    election_id,
+                    rollup=rollup,
+                    rollup_rut=rollup_rut,
+                    dictionary=dictionary,
+                )
+                new_err = ui.consolidate_errors([new_err, load_err])
+            if new_err:
+                errs[file_number] = ui.consolidate_errors([errs[file_number], new_err])
+    finally:
+        stop.set()
+        producer.join()
+    return errs
+
+
 def load_results_file(
     session: Session,
     munger_path: str,
@@ -3946,6 +4364,7 @@ def load_results_file(
     path_to_jurisdiction_dir: str,
     rollup: bool = False,
     rollup_rut: str = constants.default_subdivision_type,
+    dictionary: Optional[m.CompiledDictionary] = None,
 ) -> Optional[dict]:
     """
     required inputs:
@@ -3963,39 +4382,22 @@ def load_results_file(
     optional inputs:
         rollup: bool = False, if True, roll up results to the subdivisions specified by <rollup_rut>
         rollup_rut: str = constants.default_subdivision_type, ReportingUnitType used for rollup (typically 'county')
+        dictionary: Optional[m.CompiledDictionary] = None, compiled dictionary for the jurisdiction (if not given,
+            compiled from the dictionary.txt file in <path_to_jurisdiction_dir>)
 
     Attempts to load results from results file to the database. (Does *not* require results to pass tests.)
 
     returns:
         Optional[dict], error dictionary
     """
-    # TODO tech debt: redundant to pass results_directory_path and f_path
     munger_name = Path(munger_path).name
     file_name = Path(f_path).name
-    # read parameters from munger file
-    p, err = m.get_and_check_munger_params(munger_path)
+    df, necessary_constants, err = munge_results_file(
+        munger_path, f_path, constants, results_directory_path
+    )
     if ui.fatal_error(err):
         return err
 
-    # transform to raw df in standard form
-    df, new_err = m.file_to_raw_df(munger_path, p, f_path, results_directory_path)
-    if new_err:
-        err = ui.consolidate_errors([err, new_err])
-        if ui.fatal_error(new_err):
-            return err
-
-    # # add columns for constant-over-file elements
-    if p["constant_over_file"]:
-        necessary_constants = {
-            c: v for c, v in constants.items() if c in p["constant_over_file"]
-        }
-        df = m.add_constants_to_df(df, necessary_constants)
-    else:
-        necessary_constants = dict()
-
-    # # delete any rows with items to be ignored
-    df = m.remove_ignored_rows(df, munger_path)
-
     new_err = load_results_df(
         session,
         df,
@@ -4008,6 +4410,7 @@ def load_results_file(
         election_id,
         rollup=rollup,
         rollup_rut=rollup_rut,
+        dictionary=dictionary,
     )
     return ui.consolidate_errors([err, new_err])
 
@@ -4023,6 +4426,188 @@ def create_from_template(
         f.write(contents)
 
 
+# DataLoader for each worker process of load_juris_elections_in_parallel,
+#  so that each worker has its own database connection
+_worker_dataloader = None
+
+
+def init_load_worker(
+    param_file: str, dbname: str, major_subdivision_file: Optional[str]
+):
+    """Initializer for worker processes loading results"""
+    global _worker_dataloader
+    _worker_dataloader = DataLoader(
+        param_file=param_file,
+        dbname=dbname,
+        major_subdivision_file=major_subdivision_file,
+    )
+
+
+def load_juris_elections_in_worker(
+    jurisdiction: str,
+    elections: List[str],
+    rollup: bool,
+    report_missing_files: bool,
+    run_tests: bool,
+) -> (
+    Dict[str, List[str]],
+    Dict[str, List[str]],
+    Dict[str, bool],
+    str,
+    Optional[dict],
+):
+    """Runs DataLoader.load_juris_elections with the worker process's DataLoader"""
+    if _worker_dataloader is None:
+        err = ui.add_new_error(
+            None,
+            "system",
+            "load_juris_elections_in_worker",
+            f"No DataLoader created in worker process, so {jurisdiction} not loaded",
+        )
+        return dict(), dict(), dict(), "0000-00-00", err
+    return _worker_dataloader.load_juris_elections(
+        jurisdiction,
+        elections,
+        rollup=rollup,
+        report_missing_files=report_missing_files,
+        run_tests=run_tests,
+    )
+
+
+def load_juris_elections_in_parallel(
+    dataloader: DataLoader,
+    jurisdictions: List[str],
+    elections: Dict[str, List[str]],
+    rollup: bool = False,
+    report_missing_files: bool = False,
+    run_tests: bool = True,
+    processes: int = constants.results_load_processes,
+) -> (Dict[str, tuple], Optional[dict]):
+    """Loads results for each jurisdiction in <jurisdictions> and each of its elections
+    in <elections>, with jurisdictions divided among at most <processes> worker processes.
+    All elections of a single jurisdiction are loaded in turn by a single worker.
+    If worker processes cannot be used, loads in this process.
+    Returns:
+        Dict[str, tuple], output of DataLoader.load_juris_elections for each jurisdiction
+            loaded (without exception)
+        Optional[dict], error dictionary for jurisdictions whose loading raised an exception
+    """
+    err = None
+    juris_results = dict()
+    processes = min(processes, len(jurisdictions))
+    if processes > 1:
+        try:
+            # NB: spawn, so that workers do not inherit this process's db connections
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_load_worker,
+                initargs=(
+                    dataloader.param_file,
+                    dataloader.db_engine.url.database,
+                    dataloader.major_subdivision_file,
+                ),
+            ) as pool:
+                futures = {
+                    juris: pool.submit(
+                        load_juris_elections_in_worker,
+                        juris,
+                        elections[juris],
+                        rollup,
+                        report_missing_files,
+                        run_tests,
+                    )
+                    for juris in jurisdictions
+                }
+                for juris in jurisdictions:
+                    try:
+                        juris_results[juris] = futures[juris].result()
+                    except Exception as exc:
+                        err = ui.add_new_error(
+                            err,
+                            "jurisdiction",
+                            juris,
+                            f"Exception during loading of results: {exc}",
+                        )
+            return juris_results, err
+        except OSError as exc:
+            print(
+                f"Unable to load jurisdictions in parallel ({exc}), "
+                f"so loading them one by one"
+            )
+
+    for juris in jurisdictions:
+        juris_results[juris] = dataloader.load_juris_elections(
+            juris,
+            elections[juris],
+            rollup=rollup,
+            report_missing_files=report_missing_files,
+            run_tests=run_tests,
+        )
+    return juris_results, err
+
+
+def ej_pair_unchanged(dl: DataLoader, election: str, jurisdiction: str) -> bool:
+    """
+    Inputs:
+        dl: DataLoader
+        election: str, name of election
+        jurisdiction: str, name of jurisdiction
+
+    Returns:
+        bool, True if the election-jurisdiction pair has results in the database, and the content
+            hashes of the results files (with their mungers and the jurisdiction's dictionary)
+            in the results directory referenced by .ini files for the pair
+            are exactly those recorded in the _datafile table for the pair
+    """
+    election_id = db.name_to_id(dl.session, "Election", election)
+    juris_id = db.name_to_id(dl.session, "ReportingUnit", jurisdiction)
+    if not (election_id and juris_id):
+        return False
+    try:
+        old_hashes = db.datafile_content_hashes(dl.session, election_id, juris_id)
+    except psycopg2.Error:
+        return False
+    if not old_hashes or None in old_hashes:
+        return False
+
+    juris_system_name = jm.system_name_from_true_name(jurisdiction)
+    ini_subdir = os.path.join(dl.d["ini_dir"], juris_system_name)
+    dictionary_path = os.path.join(
+        dl.d["repository_content_root"],
+        "jurisdictions",
+        juris_system_name,
+        "dictionary.txt",
+    )
+    new_hashes = list()
+    for ini in os.listdir(ini_subdir):
+        if ini[-4:] != ".ini":
+            continue
+        params, err = ui.get_parameters(
+            required_keys=["election", "jurisdiction", "results_file", "munger_list"],
+            param_file=os.path.join(ini_subdir, ini),
+            header="election_results",
+        )
+        if ui.fatal_error(err):
+            return False
+        if params["election"] != election or params["jurisdiction"] != jurisdiction:
+            continue
+        results_file_path = os.path.join(dl.d["results_dir"], params["results_file"])
+        # files not in the results directory would not be loaded (see load_ej_pair)
+        if not os.path.isfile(results_file_path):
+            continue
+        munger_paths = [
+            os.path.join(dl.d["mungers_dir"], f"{mu.strip()}.munger")
+            for mu in params["munger_list"].split(",")
+        ]
+        new_hashes.append(
+            ui.results_content_hash(results_file_path, munger_paths, dictionary_path)
+        )
+    if None in new_hashes:
+        return False
+    return sorted(new_hashes) == sorted(old_hashes)
+
+
 def load_or_reload_all(
     rollup: bool = False,
     dbname: Optional[str] = None,
@@ -4030,6 +4615,7 @@ def load_or_reload_all(
     move_files: bool = True,
     run_tests: bool = True,
     suppress_warnings: bool = False,
+    skip_unchanged: bool = True,
 ) -> Optional[dict]:
     """
     required inputs: (none)
@@ -4040,10 +4626,12 @@ def load_or_reload_all(
         move_files: bool = True, if True, archive files after successful load (& test, if done)
         run_tests: bool = True, if True, run tests on results in database after loading.
         suppress_warnings: bool = False, if True, do not create warnings-only files in reports_and_plots_dir
+        skip_unchanged: bool = True, if True, skip any election-jurisdiction pair whose results files,
+            munger files and dictionary are byte-identical to those of the data already in the database
 
     For each election-jurisdiction pair from a <results>.ini file corresponding to a file in
         the results directory specified in the data loading parameter file, loads all result data to
-        a temporary database (and, if <run_tests> is True, runs tests on loaded data). If the
+        a staging schema (and, if <run_tests> is True, runs tests on loaded data). If the
         set of files in the election-jurisdiction pair all load without fatal error or failed test,
         remove any data for that election-jurisdiction pair from the database and load the new data.
 
@@ -4065,6 +4653,13 @@ def load_or_reload_all(
             ej_pairs.sort()
             # process each election-jurisdiction pair
             for (election, jurisdiction) in ej_pairs:
+                if skip_unchanged and ej_pair_unchanged(
+                    dataloader, election, jurisdiction
+                ):
+                    print(
+                        f"{jurisdiction} {election}: not reloaded, because files are unchanged since last load"
+                    )
+                    continue
                 # if new results pass test, remove old if exists and load new
                 new_err = reload_juris_election(
                     jurisdiction,
@@ -4135,6 +4730,8 @@ def reload_juris_election(
     Loads and archives each results file in each direct subfolder of the results_dir
     named in ./run_time.ini -- provided there the results file is specified in a *.ini file in the
     corresponding subfolder of <content_root>/ini_files_for_results. <contest_root> is read from ./run_time.ini.
+    If <run_tests>, results are loaded and tested in a staging schema, and replace existing results
+    only if all tests pass (see reload_juris_election_via_staging).
 
     returns:
         Optional[dict], error dictionary
@@ -4144,86 +4741,152 @@ def reload_juris_election(
     dl = DataLoader(dbname=dbname, param_file=param_file)
 
     if run_tests:
-        # create temp_db (preserving live db name) and point dataloader to it
-        live_db = dl.session.bind.url.database
-        ts = datetime.datetime.now().strftime("%m%d_%H%M")
-        temp_db = f"{live_db}_test_{ts}"
+        # load into a staging schema, to be swapped into the live tables if tests pass
+        err = reload_juris_election_via_staging(
+            dl,
+            juris_name,
+            election_name,
+            report_dir,
+            rollup=rollup,
+            move_files=move_files,
+            suppress_warnings=suppress_warnings,
+        )
+        return err
 
-        # load all data into temp db
-        new_err = dl.change_db(temp_db, db_param_file=param_file)
+    # Remove existing data for juris-election pair from live db
+    election_id = db.name_to_id(dl.session, "Election", election_name)
+    juris_id = db.name_to_id(dl.session, "ReportingUnit", juris_name)
+    if election_id and juris_id:
+        err_str = dl.remove_data(election_id, juris_id)
+        if err_str:
+            err = ui.add_new_error(
+                err,
+                "warn-database",
+                f"{dl.session.bind.url.database}",
+                f"Error removing data: {err_str}",
+            )
+
+    # Load new data into live db (and move successful to archive)
+    success, failure, all_tests_passed, new_err = dl.load_all(
+        report_dir=report_dir,
+        rollup=rollup,
+        election_jurisdiction_list=[(election_name, juris_name)],
+        move_files=move_files,
+        run_tests=run_tests,
+        suppress_warnings=suppress_warnings,
+    )
+    if not success:
         err = ui.consolidate_errors([err, new_err])
-        if ui.fatal_error(new_err):
-            return err
+    return err
+
+
+def reload_juris_election_via_staging(
+    dl: DataLoader,
+    juris_name: str,
+    election_name: str,
+    report_dir,
+    rollup: bool = False,
+    move_files: bool = True,
+    suppress_warnings: bool = False,
+) -> Optional[dict]:
+    """
+    required inputs:
+        dl: DataLoader, connected to the live database
+        juris_name: str, name of jurisdiction (without hyphens, e.g., 'District of Columbia')
+        election_name: str, name of election (without hyphens, e.g., '2020 General')
+        report_dir, path to directory for reporting errors, warnings and test results
+    optional inputs:
+        rollup: bool = False, if true, rolls up results within the to the major subdivision
+        move_files: bool = True, if true, move all files to archive directory if loading & testing
+            are successful
+        suppress_warnings: bool = False, if true, report only errors, not warnings
+
+    Loads jurisdiction info into the live tables, and loads and tests the results for the
+    election-jurisdiction pair in a staging schema of the live database
+    (see constants.staged_results_tables). If all files load and all tests pass,
+    replaces any existing results for the pair with the staged results in a single transaction.
+    Otherwise leaves existing results as they were.
+
+    returns:
+        Optional[dict], error dictionary
+    """
+    err = None
+    live_engine = dl.db_engine
+    ts = datetime.datetime.now().strftime("%m%d_%H%M%S")
+    # NB: postgres identifiers have at most 63 characters
+    schema = re.sub(
+        r"\W", "_", f"staging_{ts}_{jm.system_name_from_true_name(juris_name)}"
+    ).lower()[:63]
+    err_str = db.create_staging_schema(live_engine, schema)
+    if err_str:
+        err = ui.add_new_error(
+            err,
+            "database",
+            f"{live_engine.url.database}",
+            err_str,
+        )
+        return err
+
+    staging_engine = None
+    try:
+        # load all data for the pair into the staging schema
+        dl.set_search_path(f"{schema},public")
+        staging_engine = dl.db_engine
         success, failure, all_tests_passed, load_err = dl.load_all(
             report_dir=report_dir,
             move_files=False,
             rollup=rollup,
             election_jurisdiction_list=[(election_name, juris_name)],
             suppress_warnings=suppress_warnings,
+            processes=1,
         )
         if load_err:
             err = ui.consolidate_errors([err, load_err])
         # if any of the data failed to load
         if failure or ui.fatal_error(load_err):
-            # cleanup temp database
-            db.remove_database(db_param_file=param_file, dbname=temp_db)
             return err
-
         # if any tests failed
         elif not all_tests_passed[f"{election_name};{juris_name}"]:
             print(
                 f"{juris_name} {election_name}: No old data removed and no new data loaded because of failed tests."
             )
-        else:
-            # switch to live db
-            new_err = dl.change_db(live_db, db_param_file=param_file)
-            err = ui.consolidate_errors([err, new_err])
-            if ui.fatal_error(new_err):
-                return err
-    else:
-        temp_db = None  # for syntax-checker
-        all_tests_passed = dict()
-    if (not run_tests) or (
-        (f"{election_name};{juris_name}" in all_tests_passed.keys())
-        and (all_tests_passed[f"{election_name};{juris_name}"])
-    ):
-        # Remove existing data for juris-election pair from live db
+            return err
+
         election_id = db.name_to_id(dl.session, "Election", election_name)
         juris_id = db.name_to_id(dl.session, "ReportingUnit", juris_name)
-        if election_id and juris_id:
-            err_str = dl.remove_data(election_id, juris_id)
-            if err_str:
-                err = ui.add_new_error(
-                    err,
-                    "warn-database",
-                    f"{dl.session.bind.url.database}",
-                    f"Error removing data: {err_str}",
-                )
+        download_date = db.latest_download_date(dl.session, election_id, juris_id)
 
-        # Load new data into live db (and move successful to archive)
-        success, failure, all_tests_passed, new_err = dl.load_all(
-            report_dir=report_dir,
-            rollup=rollup,
-            election_jurisdiction_list=[(election_name, juris_name)],
-            move_files=move_files,
-            run_tests=run_tests,
-            suppress_warnings=suppress_warnings,
-        )
-        if success:
-            if not all_tests_passed[f"{election_name};{juris_name}"]:
-                # this should never happen, since upload was just tested. Still...
-                err = ui.add_new_error(
-                    err,
-                    "database",
-                    f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
-                    f"Data loaded successfully to test db and passed tests, so old data was removed from live db.\n"
-                    f"But new data loaded to live db failed some tests.",
-                )
-        else:
+        # replace live results for the pair with the staged results
+        dl.set_search_path(None)
+        err_str = db.swap_in_staged_results(live_engine, schema, election_id, juris_id)
+        if err_str:
+            err = ui.add_new_error(
+                err,
+                "database",
+                f"{live_engine.url.database}",
+                err_str,
+            )
+            return err
+
+        if move_files:
+            new_err = dl.archive_juris_results(
+                jm.system_name_from_true_name(juris_name), download_date
+            )
             err = ui.consolidate_errors([err, new_err])
-    if run_tests:
-        # cleanup temp database
-        db.remove_database(db_param_file=param_file, dbname=temp_db)
+    finally:
+        dl.set_search_path(None)
+        # close the connections searching the staging schema, which is about to be dropped
+        if staging_engine is not None:
+            db.dispose_engine(staging_engine)
+        # remove staging schema (if not already removed by the swap)
+        err_str = db.remove_staging_schema(live_engine, schema)
+        if err_str:
+            err = ui.add_new_error(
+                err,
+                "warn-database",
+                f"{live_engine.url.database}",
+                err_str,
+            )
     return err
 
 
@@ -4238,6 +4901,7 @@ def datafile_info(
     jurisdiction_id: int,
     election_id: int,
     is_preliminary: bool,
+    content_hash: Optional[str] = None,
 ) -> (int, Optional[dict]):
     """Inserts record into _datafile table. Returns id of datafile record"""
     err = None
@@ -4253,6 +4917,7 @@ def datafile_info(
                 election_id,
                 datetime.datetime.now(),
                 is_preliminary,
+                content_hash,
             ]
         ],
         columns=[
@@ -4265,6 +4930,7 @@ def datafile_info(
             "Election_Id",
             "created_at",
             "is_preliminary",
+            "content_hash",
         ],
     )
     data = m.clean_strings(data, ["short_name"])
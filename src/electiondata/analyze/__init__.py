@@ -377,7 +377,8 @@ def get_votecount_data(
         (or larger, if that's all that's available), Contest,
         Selection, VoteCountType along with various database Ids
     """
-    unsummed = db.unsummed_vote_counts_with_rollup_subdivision_id(
+    # NB: only sums over subdivisions are needed, so read pre-summed counts
+    unsummed = db.rolled_up_vote_counts(
         session,
         election_id,
         jurisdiction_id,
@@ -473,7 +474,8 @@ def create_bar(
             Srungavarapu & Tsai in _MAA Focus_, Feb/March 2021, pp. 10-13.
             See http://digitaleditions.walsworthprintgroup.com/publication/?m=7656&i=694516&p=10&ver=html5
     """
-    unsummed = db.unsummed_vote_counts_with_rollup_subdivision_id(
+    # NB: only sums over subdivisions are needed, so read pre-summed counts
+    unsummed = db.rolled_up_vote_counts(
         session, election_id, jurisdiction_id, subdivision_type
     )
 
@@ -488,8 +490,9 @@ def create_bar(
         unsummed = unsummed[unsummed["Contest"] == contest_or_contest_group]
 
     multiple_ballot_types = len(unsummed["CountItemType"].unique()) > 1
+    # sum over datafiles
     groupby_cols = [
-        "ReportingUnitType",
+        "ParentReportingUnit_Id",
         "ParentName",
         "ParentReportingUnitType",
         "Candidate_Id",
@@ -502,7 +505,7 @@ def create_bar(
         "contest_district_type",
         "Party",
     ]
-    unsummed = unsummed.groupby(groupby_cols).sum().reset_index()
+    unsummed = unsummed.groupby(groupby_cols)["Count"].sum().reset_index()
 
     # Now process data - this is the heart of the scoring/ranking algorithm
     try:
@@ -456,6 +456,35 @@ if 1:
         "ks_c-5601-1987",
     }
 
+# database access
+if 1:
+    # number of rows fetched per round trip when streaming VoteCount data from the db
+    vote_count_chunksize = 100000
+    # tables holding the results of a datafile, which are loaded into a staging schema
+    #  when results are reloaded (in order of insertion into the live tables)
+    staged_results_tables = ["_datafile", "VoteCount", "_rollup"]
+
+# file reading
+if 1:
+    # number of rows collected from a streamed xml file before they are added to the dataframe
+    xml_rows_per_chunk = 100000
+    # number of bytes read at a time when hashing the contents of a file
+    hash_block_size = 1 << 20
+
+# parallel processing
+if 1:
+    # maximum number of processes reading sheets of a single Excel file
+    excel_sheet_processes = min(4, os.cpu_count() or 1)
+    # minimum number of sheets in an Excel file for sheets to be read in parallel
+    min_sheets_for_parallel_read = 8
+    # maximum number of processes loading results files (each with its own db connection)
+    results_load_processes = min(4, os.cpu_count() or 1)
+    # key of the db advisory lock serializing creation of Selection records
+    selection_lock_key = 20210001
+    # maximum number of munged dataframes waiting to be inserted into the db
+    #  while the next munger (or the next results file) is munged
+    pending_munged_frames = 1
+
 # parameters for user-created files (run_time.ini, <result_file>.ini, etc.)
 if 1:
     sdl_pars_req = [
@@ -35,16 +35,28 @@ import pandas as pd
 from electiondata import munge as m, analyze as an, constants, userinterface as ui
 import re
 import os
+from contextlib import contextmanager
 
 # sqlalchemy imports below are necessary, even if syntax-checker doesn't think so!
 
-from typing import Optional, List, Dict, Any, Set
+from typing import Optional, List, Dict, Any, Set, Tuple, Iterator, Union
 
 
 # these form the universe of jurisdictions that can be displayed via the display_jurisdictions function.
 
 db_pars = ["host", "port", "dbname", "user", "password"]
 
+# one engine (and so one connection pool) per database (and search path) per process, shared by all
+# callers of sql_alchemy_connect. Keyed by (process id, url, search path) so that forked worker
+# processes never reuse the parent's pooled connections.
+_engines: Dict[Tuple[int, str, Optional[str]], sqlalchemy.engine.Engine] = dict()
+
+# name <-> Id maps for element tables, per engine (so shared by all sessions on the same db),
+# each element loaded with a single query on first lookup. See cached_name_id_maps.
+_name_id_cache: Dict[
+    sqlalchemy.engine.Engine, Dict[str, Tuple[Dict[Any, int], Dict[int, Any]]]
+] = dict()
+
 
 def get_database_names(con: psycopg2.extensions.connection):
     """Return dataframe with one column called `datname`"""
@@ -73,6 +85,8 @@ def remove_database(
 
     if dbname:
         db_params["dbname"] = dbname
+    # release this process's pooled connections to the target database
+    dispose_engines(dbname=db_params["dbname"])
     # connect to postgres, not to the target database
     postgres_params = db_params.copy()
     postgres_params["dbname"] = "postgres"
@@ -167,32 +181,31 @@ def append_to_composing_reporting_unit_join(
         working["split"] = working["Name"].apply(lambda x: x.split(";"))
         working["length"] = working["split"].apply(len)
 
-        # pull ReportingUnit to get ids matched to names
-        ru_cdf = pd.read_sql_table("ReportingUnit", engine, index_col=None)
+        # get name of ith ancestor of each reporting unit
+        #  E.g., ancestor_0 is largest ancestor (i.e., shortest string, often the state);
+        #  ancestor_1 is the second-largest parent, etc.
         ru_static = working.copy()
+        max_length = working["length"].max()
+        for i in range(max_length):
+            ru_static[f"ancestor_{i}"] = ru_static["split"].apply(
+                lambda x: ";".join(x[: i + 1])
+            )
 
-        # add db Id column to ru_static, if it's not already there
+        # add db Ids of reporting units (if not already there) and of all ancestors
+        id_map = {
+            f"Id_{i}": (f"ancestor_{i}", "ReportingUnit") for i in range(max_length)
+        }
         if "Id" not in working.columns:
-            ru_static = ru_static.merge(ru_cdf[["Name", "Id"]], on="Name", how="left")
+            id_map["Id"] = ("Name", "ReportingUnit")
+        ru_static = append_ids_by_name(
+            engine, ru_static, id_map, null_ids_to_zero=False
+        )
 
         # create a list of rows to append to the ComposingReportingUnitJoin element
         cruj_dframe_list = []
-        for i in range(working["length"].max()):
+        for i in range(max_length):
             # check that all components of all Reporting Units are themselves ReportingUnits
-            ru_for_cruj = (
-                ru_static.copy()
-            )  # start fresh, without detritus from previous i
-
-            # get name of ith ancestor
-            #  E.g., ancestor_0 is largest ancestor (i.e., shortest string, often the state);
-            #  ancestor_1 is the second-largest parent, etc.
-            ru_for_cruj[f"ancestor_{i}"] = ru_static["split"].apply(
-                lambda x: ";".join(x[: i + 1])
-            )
-            # get Id of ith ancestor
-            ru_for_cruj = ru_for_cruj.merge(
-                ru_cdf, left_on=f"ancestor_{i}", right_on="Name", suffixes=["", f"_{i}"]
-            )
+            ru_for_cruj = ru_static[ru_static[f"Id_{i}"].notnull()]
 
             # Add parent-child pair for ith ancestor.
             cruj_dframe_list.append(
@@ -213,6 +226,14 @@ def append_to_composing_reporting_unit_join(
                 error_name,
             )
             err = ui.consolidate_errors([err, insert_err])
+            # keep rolled-up counts consistent with the new nesting relationships
+            err_str = refresh_rollup_for_reporting_units(
+                engine, cruj_dframe["ChildReportingUnit_Id"].dropna().unique()
+            )
+            if err_str:
+                err = ui.add_new_error(
+                    err, "warn-database", f"{engine.url.database}", err_str
+                )
     return err
 
 
@@ -265,14 +286,12 @@ def test_connection_and_tables(
         )
         if new_err:
             err = ui.consolidate_errors([err, new_err])
-            engine.dispose()
             return False, err
+        # NB: engine is shared (see sql_alchemy_connect), so do not dispose of it here
         elems, joins, o = get_cdf_db_table_names(engine)
         # if there aren't any element tables or join tables, the db isn't what it needs to be.
         if not elems or not joins:
-            engine.dispose()
             return False, err
-        engine.dispose()
 
     except Exception as e:
         err = ui.add_new_error(
@@ -281,82 +300,11 @@ def test_connection_and_tables(
             "database.test_connection_and_tables",
             f"Unexpected exception while connecting to database: {e}",
         )
-        if engine:
-            engine.dispose()
         return False, err
     # if no errors found, return True
-    if engine:
-        engine.dispose()
     return True, err
 
 
-# TODO move to more appropriate module?
-
-
-def append_to_composing_reporting_unit_join(
-    engine: sqlalchemy.engine, ru: pd.DataFrame, error_type, error_name
-) -> Optional[dict]:
-    """<ru> is a dframe of reporting units, with cdf internal name in column 'Name'.
-    cdf internal name indicates nesting via semicolons `;`.
-    This routine calculates the nesting relationships from the Names and uploads to db.
-    Returns the *all* composing-reporting-unit-join data from the db.
-    By convention, a ReportingUnit is its own ancestor (ancestor_0).
-    NB: name Child/Parent is misleading. It's really Descendent/Ancestor"""
-    working = ru.copy()
-    err = None
-    if not working.empty:
-        working["split"] = working["Name"].apply(lambda x: x.split(";"))
-        working["length"] = working["split"].apply(len)
-
-        # pull ReportingUnit to get ids matched to names
-        ru_cdf = pd.read_sql_table("ReportingUnit", engine, index_col=None)
-        ru_static = working.copy()
-
-        # add db Id column to ru_static, if it's not already there
-        if "Id" not in working.columns:
-            ru_static = ru_static.merge(ru_cdf[["Name", "Id"]], on="Name", how="left")
-
-        # create a list of rows to append to the ComposingReportingUnitJoin element
-        cruj_dframe_list = []
-        for i in range(working["length"].max()):
-            # check that all components of all Reporting Units are themselves ReportingUnits
-            ru_for_cruj = (
-                ru_static.copy()
-            )  # start fresh, without detritus from previous i
-
-            # get name of ith ancestor
-            #  E.g., ancestor_0 is largest ancestor (i.e., shortest string, often the state);
-            #  ancestor_1 is the second-largest parent, etc.
-            ru_for_cruj[f"ancestor_{i}"] = ru_static["split"].apply(
-                lambda x: ";".join(x[: i + 1])
-            )
-            # get Id of ith ancestor
-            ru_for_cruj = ru_for_cruj.merge(
-                ru_cdf, left_on=f"ancestor_{i}", right_on="Name", suffixes=["", f"_{i}"]
-            )
-
-            # Add parent-child pair for ith ancestor.
-            cruj_dframe_list.append(
-                ru_for_cruj[["Id", f"Id_{i}"]].rename(
-                    columns={
-                        "Id": "ChildReportingUnit_Id",
-                        f"Id_{i}": "ParentReportingUnit_Id",
-                    }
-                )
-            )
-        if cruj_dframe_list:
-            cruj_dframe = pd.concat(cruj_dframe_list)
-            insert_err = insert_to_cdf_db(
-                engine,
-                cruj_dframe,
-                "ComposingReportingUnitJoin",
-                error_type,
-                error_name,
-            )
-            err = ui.consolidate_errors([err, insert_err])
-    return err
-
-
 def create_or_reset_db(
     content_root: str,
     db_param_file: Optional[str] = None,
@@ -452,12 +400,15 @@ def sql_alchemy_connect(
     db_params: Optional[Dict[str, str]] = None,
     db_param_file: Optional[str] = None,
     dbname: Optional[str] = None,
+    search_path: Optional[str] = None,
 ) -> (sqlalchemy.engine, Optional[dict]):
     """
     Inputs:
         db_params: Optional[Dict[str, str]],
         db_param_file: Optional[str] = None,
         dbname: Optional[str] = None,
+        search_path: Optional[str] = None, if given, comma-separated list of schemas searched
+            for unqualified table names by all connections of the engine (e.g., 'staging,public')
 
     Returns:
         sqlalchemy.engine, uses parameters in <db_params> if given, otherwise uses <db_param_file>,
@@ -474,13 +425,71 @@ def sql_alchemy_connect(
     url = "postgresql://{user}:{password}@{host}:{port}/{dbname}"
     url = url.format(**params)
 
-    # The return value of create_engine() is our connection object
-    engine = sa.create_engine(
-        url, client_encoding=constants.default_encoding, pool_size=20, max_overflow=40
-    )
+    # reuse the engine (and its connection pool) already created for this database, if any
+    key = (os.getpid(), url, search_path)
+    engine = _engines.get(key)
+    if engine is None:
+        if search_path:
+            connect_args = {"options": f"-c search_path={search_path}"}
+        else:
+            connect_args = dict()
+        # The return value of create_engine() is our connection object
+        # NB: pre-ping replaces pooled connections killed since checkin (e.g., by remove_database)
+        engine = sa.create_engine(
+            url,
+            client_encoding=constants.default_encoding,
+            pool_size=20,
+            max_overflow=40,
+            pool_pre_ping=True,
+            connect_args=connect_args,
+        )
+        _engines[key] = engine
     return engine, err
 
 
+def dispose_engines(dbname: Optional[str] = None):
+    """Closes all pooled connections of the shared engines of this process (or, if <dbname> is given,
+    of the shared engine(s) for the database <dbname>) and forgets those engines, so that the next call
+    to sql_alchemy_connect creates a fresh engine."""
+    for key in [k for k in _engines.keys() if k[0] == os.getpid()]:
+        if dbname is None or _engines[key].url.database == dbname:
+            engine = _engines.pop(key)
+            _name_id_cache.pop(engine, None)
+            engine.dispose()
+    return
+
+
+def dispose_engine(engine: sqlalchemy.engine.Engine):
+    """Closes all pooled connections of the shared engine <engine> and forgets it (and its
+    cached name-Id maps), e.g., when the schemas in its search path are no longer needed."""
+    for key in [k for k, v in _engines.items() if v is engine]:
+        _engines.pop(key)
+    _name_id_cache.pop(engine, None)
+    engine.dispose()
+    return
+
+
+@contextmanager
+def pooled_cursor(
+    session_or_engine: Union[Session, sqlalchemy.engine.Engine]
+) -> Iterator[psycopg2.extensions.cursor]:
+    """Checks a connection out of the pool of the engine bound to <session_or_engine>
+    and yields a cursor on it. Cursor is closed and connection returned to the pool on exit,
+    even if an exception is raised."""
+    if isinstance(session_or_engine, Session):
+        engine = session_or_engine.bind
+    else:
+        engine = session_or_engine
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        # NB: for a pooled connection, close() returns the connection to the pool
+        connection.close()
+
+
 def create_db_if_not_ok(
     content_root: str,
     dbname: Optional[str] = None,
@@ -499,9 +508,70 @@ def create_db_if_not_ok(
             db_param_file=db_param_file,
         )
         err = ui.consolidate_errors([err, new_err])
+    else:
+        # databases created before _datafile had a content_hash column
+        engine, new_err = sql_alchemy_connect(
+            db_params=db_params, db_param_file=db_param_file, dbname=dbname
+        )
+        err = ui.consolidate_errors([err, new_err])
+        if engine:
+            # databases created before the _rollup table existed
+            err_str = add_rollup_table_if_missing(engine, content_root)
+            if err_str:
+                err = ui.add_new_error(
+                    err, "warn-database", f"{engine.url.database}", err_str
+                )
+            err_str = add_datafile_content_hash_column(engine)
+            if err_str:
+                err = ui.add_new_error(
+                    err, "warn-database", f"{engine.url.database}", err_str
+                )
     return err
 
 
+def add_rollup_table_if_missing(
+    engine: sqlalchemy.engine.Engine, content_root: str
+) -> Optional[str]:
+    """If the db has no _rollup table, creates it (with its indexes) and fills it
+    from the VoteCount table. Returns error string (or None)"""
+    try:
+        with pooled_cursor(engine) as cursor:
+            cursor.execute("""SELECT to_regclass('public."_rollup"')""")
+            (exists,) = cursor.fetchone()
+        if exists:
+            return None
+        # NB: creates only the tables missing from the db
+        session = sqlalchemy.orm.sessionmaker(bind=engine)()
+        create_common_data_format_tables(
+            session,
+            dirpath=os.path.join(content_root, "electiondata", "CDF_schema_def_info"),
+        )
+        session.close()
+        with pooled_cursor(engine) as cursor:
+            cursor.execute("SELECT \"Id\" FROM _datafile")
+            datafile_ids = [idx for (idx,) in cursor.fetchall()]
+    except Exception as exc:
+        return f"Error creating _rollup table: {exc}"
+    return refresh_rollup_for_datafiles(engine, datafile_ids)
+
+
+def add_datafile_content_hash_column(
+    engine: sqlalchemy.engine.Engine,
+) -> Optional[str]:
+    """Adds content_hash column to _datafile table if it is not already there.
+    Returns error string (or None)"""
+    try:
+        with pooled_cursor(engine) as cursor:
+            cursor.execute(
+                "ALTER TABLE _datafile ADD COLUMN IF NOT EXISTS content_hash VARCHAR"
+            )
+            cursor.connection.commit()
+        err_str = None
+    except Exception as exc:
+        err_str = f"Error adding content_hash column to _datafile table: {exc}"
+    return err_str
+
+
 def get_cdf_db_table_names(eng: sqlalchemy.engine):
     """This is postgresql-specific"""
     db_columns = pd.read_sql_table("columns", eng, schema="information_schema")
@@ -540,10 +610,14 @@ def name_from_id_cursor(
 
 
 def name_from_id(session: Session, element: str, idx: int) -> Optional[str]:
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    name = name_from_id_cursor(cursor, element, idx)
-    connection.close()
+    maps = cached_name_id_maps(session.bind, element)
+    if maps and idx in maps[1].keys():
+        return maps[1][idx]
+    with pooled_cursor(session) as cursor:
+        name = name_from_id_cursor(cursor, element, idx)
+    if maps and name is not None:
+        maps[0].setdefault(name, idx)
+        maps[1][idx] = name
     return name
 
 
@@ -576,14 +650,67 @@ def name_to_id_cursor(
 
 def name_to_id(session: Session, element: str, name: str) -> Optional[int]:
     """Condition can be a field/value pair, e.g., ('contest_type','Candidate')"""
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    idx = name_to_id_cursor(cursor, element, name)
-
-    connection.close()
+    maps = cached_name_id_maps(session.bind, element)
+    if maps and name in maps[0].keys():
+        return maps[0][name]
+    # fall back to db, in case record was added to db other than via this module
+    with pooled_cursor(session) as cursor:
+        idx = name_to_id_cursor(cursor, element, name)
+    if maps and idx is not None:
+        maps[0][name] = idx
+        maps[1][idx] = name
     return idx
 
 
+def cached_name_id_maps(
+    engine: sqlalchemy.engine.Engine, element: str
+) -> Optional[Tuple[Dict[Any, int], Dict[int, Any]]]:
+    """Returns pair of dictionaries (name-to-Id, Id-to-name) for <element>, reading the whole
+    element table with a single query the first time <element> is requested for <engine>.
+    Returns None if the element has no name field in the db (e.g., Selection)"""
+    element_cache = _name_id_cache.setdefault(engine, dict())
+    if element not in element_cache.keys():
+        if element in ["CandidateContest", "BallotMeasureContest"]:
+            q = sql.SQL('SELECT "Id", "Name" FROM "Contest" WHERE contest_type = %s')
+            params = [element[: -len("Contest")]]
+        else:
+            q = sql.SQL('SELECT "Id", {name_field} FROM {element}').format(
+                name_field=sql.Identifier(get_name_field(element)),
+                element=sql.Identifier(element),
+            )
+            params = None
+        try:
+            with pooled_cursor(engine) as cursor:
+                cursor.execute(q, params)
+                results = cursor.fetchall()
+        except psycopg2.Error:
+            return None
+        name_to_idx = dict()
+        for idx, name in results:
+            # NB: if name is not unique (e.g., Contest), keep the first, as a db lookup would
+            name_to_idx.setdefault(name, idx)
+        element_cache[element] = (name_to_idx, {idx: name for idx, name in results})
+    return element_cache[element]
+
+
+def invalidate_name_id_cache(
+    engine: sqlalchemy.engine.Engine, element: Optional[str] = None
+):
+    """Forgets cached names and Ids of <element> (or, if no element given, of all elements) for <engine>.
+    Must be called after any change to the names or Ids of an element table."""
+    if element is None:
+        _name_id_cache.pop(engine, None)
+        return
+    element_cache = _name_id_cache.get(engine, dict())
+    if element in ["Contest", "CandidateContest", "BallotMeasureContest"]:
+        related = ["Contest", "CandidateContest", "BallotMeasureContest"]
+    else:
+        related = [element]
+    for e in related:
+        element_cache.pop(e, None)
+    return
+
+
 def get_name_field(element: str) -> str:
     if element in ["CandidateSelection", "BallotMeasureSelection"]:
         field = "Id"
@@ -627,10 +754,14 @@ def insert_to_cdf_db(
     encoding: str = constants.default_encoding,
     timestamp: Optional[str] = None,
     on_conflict: str = "NOTHING",
+    connection: Optional[psycopg2.extensions.connection] = None,
 ) -> Optional[dict]:
     """Inserts any new records in <df> into <element>; if <element> has a timestamp column
     it must be specified in <timestamp>; <df> must have columns matching <element>,
-    except Id and <timestamp> if any. Returns an error message (or None)"""
+    except Id and <timestamp> if any. If <connection> is given, it is used (and left open) and
+    nothing is committed, so that the insertion is part of the caller's transaction; otherwise a
+    connection is checked out of <engine>'s pool and the insertion is committed.
+    Returns an error message (or None)"""
 
     err = None
     matched_with_old = pd.DataFrame()  # to satisfy syntax-checker
@@ -641,7 +772,11 @@ def insert_to_cdf_db(
         working.drop_duplicates(inplace=True)
 
     # initialize connection and cursor
-    connection = engine.raw_connection()
+    if connection:
+        own_connection = False
+    else:
+        own_connection = True
+        connection = engine.raw_connection()
     cursor = connection.cursor()
 
     # identify new ReportingUnits, must later enter nesting info in db
@@ -649,60 +784,52 @@ def insert_to_cdf_db(
         working = m.clean_strings(working, ["Name"])
         # append ids (if matched) and nulls (if not matched)
 
-        matched_with_old = append_id_to_dframe(
-            engine, working, "ReportingUnit", {"Name": "Name"}, null_ids_to_zero=False
+        matched_with_old = append_ids_by_name(
+            engine,
+            working,
+            {"ReportingUnit_Id": ("Name", "ReportingUnit")},
+            null_ids_to_zero=False,
         )
 
-    # name temp table by username and timestamp to avoid conflict
-    temp_table = table_named_to_avoid_conflict(engine, "__temp_insert")
-
-    if element in [
-        "BallotMeasureSelection",
-        "BallotMeasureContest",
-        "CandidateSelection",
-        "CandidateContest",
-    ]:
-        # create temp table with Id column
-        q = sql.SQL(
-            "CREATE TABLE {temp_table} AS TABLE {element} WITH NO DATA;"
-        ).format(element=sql.Identifier(element), temp_table=sql.Identifier(temp_table))
-    else:
-        # create temp table without Id
-        q = sql.SQL(
-            'CREATE TABLE {temp_table} AS TABLE {element} WITH NO DATA; ALTER TABLE {temp_table} DROP COLUMN "Id";'
-        ).format(element=sql.Identifier(element), temp_table=sql.Identifier(temp_table))
-
-    cursor.execute(q)
-    if timestamp:
-        # drop timestamp column
-        q = sql.SQL("ALTER TABLE {temp_table} DROP COLUMN {ts_col}").format(
-            ts_col=sql.Identifier(timestamp), temp_table=temp_table
+    # determine columns to load: Id is assigned by db except for the subclass tables,
+    #  whose Id comes from the parent (Contest or Selection); timestamp is set by db
+    element_columns, type_map = get_column_names(cursor, element)
+    temp_columns = [
+        c
+        for c in element_columns
+        if c != timestamp
+        and (
+            c != "Id"
+            or element
+            in [
+                "BallotMeasureSelection",
+                "BallotMeasureContest",
+                "CandidateSelection",
+                "CandidateContest",
+            ]
         )
-        cursor.execute(q)
-        working = working.drop([timestamp], axis=1)
-    connection.commit()
-
-    # make sure datatypes of working match the types of target
-    # get set <mixed_int> of cols with integers & nulls and kludge only those
-    temp_columns, type_map = get_column_names(cursor, temp_table)
-    mixed_int = [
-        c  # TODO Selection_Id was numerical but not int here for AZ (xml)
-        for c in temp_columns
-        if c in working.columns
-        and type_map[c] == "integer"
-        and working[c].dtype != "int64"
     ]
-    for c in mixed_int:
-        # set nulls to 0 (kludge because pandas can't have NaN in 'int64' column)
-        working[c] = working[c].fillna(0).astype("int64", errors="ignore")
 
-    # Prepare data
-    output = io.StringIO()
-    temp_only_cols = [c for c in temp_columns if c not in working.columns]
+    # make sure integer columns with nulls are written as integers (not, e.g., 3.0)
+    #  so that nulls need no special handling in the db
+    for c in temp_columns:
+        if (
+            c in working.columns
+            and type_map[c] == "integer"
+            and working[c].dtype != "int64"
+        ):
+            try:
+                working[c] = pd.to_numeric(working[c]).astype("Int64")
+            except (ValueError, TypeError):
+                pass
 
     # add any missing columns needed for temp table to working
-    for c in temp_only_cols:
-        working = m.add_constant_column(working, c, None)
+    for c in temp_columns:
+        if c not in working.columns:
+            working = m.add_constant_column(working, c, None)
+
+    # Prepare data, marking nulls with the COPY null string
+    output = io.StringIO()
     working[temp_columns].drop_duplicates().to_csv(
         output,
         sep=sep,
@@ -710,25 +837,38 @@ def insert_to_cdf_db(
         encoding=encoding,
         index=False,
         quoting=csv.QUOTE_MINIMAL,
+        na_rep="\\N",
     )
     # set current position for the StringIO object to the beginning of the string
     output.seek(0)
 
-    # Insert data
-    q_copy = sql.SQL("COPY {temp_table} FROM STDOUT").format(
-        temp_table=sql.Identifier(temp_table)
-    )
+    # temp table is private to this connection and disappears at commit
+    temp_table = f"__temp_insert_{element}"
+    fields = sql.SQL(",").join([sql.Identifier(x) for x in temp_columns])
+    q_insert = "<unknown query>"
     try:
-        cursor.copy_expert(q_copy, output)
-        connection.commit()
+        if not own_connection:
+            # so that failure here can be undone without aborting caller's transaction
+            cursor.execute("SAVEPOINT insert_to_cdf_db")
+        q = sql.SQL(
+            "DROP TABLE IF EXISTS {temp_table}; "
+            "CREATE TEMP TABLE {temp_table} ON COMMIT DROP AS SELECT {fields} FROM {element} WITH NO DATA"
+        ).format(
+            temp_table=sql.Identifier(temp_table),
+            fields=fields,
+            element=sql.Identifier(element),
+        )
+        cursor.execute(q)
 
-        #  undo kludge (see above) setting 0 values to nulls inside db in temp table
-        for c in mixed_int:
-            q_kludge = sql.SQL(
-                "UPDATE {temp_table} SET {c} = NULL WHERE {c} = 0"
-            ).format(temp_table=sql.Identifier(temp_table), c=sql.Identifier(c))
-            cursor.execute(q_kludge)
-        connection.commit()  # TODO when Selection_Id was in mixed_int, this emptied temp table, why?
+        # Insert data
+        q_copy = sql.SQL(
+            "COPY {temp_table} FROM STDIN WITH (FORMAT csv, DELIMITER {sep}, NULL {null})"
+        ).format(
+            temp_table=sql.Identifier(temp_table),
+            sep=sql.Literal(sep),
+            null=sql.Literal("\\N"),
+        )
+        cursor.copy_expert(q_copy, output)
 
         # define update clause if necessary
         name_field = get_name_field(element)
@@ -747,30 +887,30 @@ def insert_to_cdf_db(
             conflict_target = sql.SQL("")
 
         # insert records from temp table into <element> table
+        cursor.execute("SAVEPOINT before_insert")
         try:
             q_insert = sql.SQL(
                 "INSERT INTO {t}({fields}) SELECT * FROM {temp_table} ON CONFLICT {conflict_action} {conflict_target}"
             ).format(
                 t=sql.Identifier(element),
-                fields=sql.SQL(",").join([sql.Identifier(x) for x in temp_columns]),
+                fields=fields,
                 temp_table=sql.Identifier(temp_table),
                 conflict_action=conflict_action,
                 conflict_target=conflict_target,
             )
             cursor.execute(q_insert)
-            connection.commit()
         except Exception as exc:
             if on_conflict.upper() != "NOTHING":
                 # try again, with no action on conflict
+                cursor.execute("ROLLBACK TO SAVEPOINT before_insert")
                 q_insert = sql.SQL(
                     "INSERT INTO {t}({fields}) SELECT * FROM {temp_table} ON CONFLICT DO NOTHING"
                 ).format(
                     t=sql.Identifier(element),
-                    fields=sql.SQL(",").join([sql.Identifier(x) for x in temp_columns]),
+                    fields=fields,
                     temp_table=sql.Identifier(temp_table),
                 )
                 cursor.execute(q_insert)
-                connection.commit()
                 err = ui.add_new_error(
                     err,
                     f"warn-{error_type}",
@@ -778,32 +918,41 @@ def insert_to_cdf_db(
                     f"Error upserting {element} resolved by only inserting and not updating. "
                     f"Exception: {exc}",
                 )
+            else:
+                raise
+        if own_connection:
+            # commit, which also drops temp table
+            connection.commit()
+        else:
+            q = sql.SQL("DROP TABLE {temp_table}").format(
+                temp_table=sql.Identifier(temp_table)
+            )
+            cursor.execute(q)
+            cursor.execute("RELEASE SAVEPOINT insert_to_cdf_db")
 
     except Exception as exc:
         print(exc)
+        if own_connection:
+            connection.rollback()
+        else:
+            cursor.execute("ROLLBACK TO SAVEPOINT insert_to_cdf_db")
         err = ui.add_new_error(
             err,
             error_type,
             error_name,
             f"Exception inserting element {element}: {exc}",
         )
-        q_insert = "<unknown query>"
+        if q_insert != "<unknown query>":
+            err = ui.add_new_error(
+                err,
+                "system",
+                f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
+                f"During insert/update of {element}, this query failed:\n"
+                f"{cursor.mogrify(q_insert).decode()}",
+            )
 
-    # remove temp table
-    try:
-        q_remove = sql.SQL("DROP TABLE IF EXISTS {temp_table}").format(
-            temp_table=sql.Identifier(temp_table)
-        )
-        cursor.execute(q_remove)
-    except psycopg2.errors.InFailedSqlTransaction as exc:
-        err = ui.add_new_error(
-            err,
-            "system",
-            f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
-            f"During insert/update of {element}, previous query caused transaction to fail:\n"
-            f"{cursor.mogrify(q_insert)}",
-        )
-        return err
+    # names and Ids of <element> may have changed
+    invalidate_name_id_cache(engine, element)
 
     if element == "ReportingUnit":
         # check get RUs not matched and process them
@@ -818,9 +967,9 @@ def insert_to_cdf_db(
             if append_err:
                 err = ui.consolidate_errors([err, append_err])
 
-    connection.commit()
     cursor.close()
-    connection.close()
+    if own_connection:
+        connection.close()
     return err
 
 
@@ -892,6 +1041,51 @@ def append_id_to_dframe(
     return df_appended
 
 
+def append_ids_by_name(
+    engine: sqlalchemy.engine,
+    df: pd.DataFrame,
+    id_map: Dict[str, Tuple[str, str]],
+    null_ids_to_zero: bool = True,
+) -> pd.DataFrame:
+    """Returns a copy of <df> with an Id column appended for each item of <id_map>, which maps
+    the name of the new column to a pair (column of <df> holding names, element). Ids are
+    looked up in the in-memory name-Id map of each element (see cached_name_id_maps), so
+    any number of columns is resolved with at most one query per element. Unmatched items
+    get null Id (or 0, if <null_ids_to_zero>)"""
+    working = df.copy()
+    for id_col, (name_col, element) in id_map.items():
+        if element == "Candidate":
+            # regularize names
+            working[name_col] = m.regularize_candidate_names(working[name_col])
+        names = working[name_col].astype(object)
+
+        newly_read = element not in _name_id_cache.get(engine, dict()).keys()
+        maps = cached_name_id_maps(engine, element)
+        if maps is None:
+            # element has no single name field, so match in db
+            working = append_id_to_dframe(
+                engine,
+                working,
+                element,
+                col_map={name_col: get_name_field(element)},
+                null_ids_to_zero=null_ids_to_zero,
+            ).rename(columns={f"{element}_Id": id_col})
+            continue
+        ids = names.map(maps[0])
+
+        # if some names are not found in a map read earlier, re-read the map once,
+        #  in case records were added to the db by another process
+        unmatched = ids.isnull() & names.notnull() & (names != "")
+        if unmatched.any() and not newly_read:
+            invalidate_name_id_cache(engine, element)
+            ids = names.map(cached_name_id_maps(engine, element)[0])
+        working[id_col] = ids
+
+    if null_ids_to_zero:
+        working, _ = m.clean_ids(working, list(id_map.keys()))
+    return working
+
+
 def get_column_names(
     cursor: psycopg2.extensions.cursor, table: str
 ) -> (List[str], Dict[str, Any]):
@@ -906,21 +1100,61 @@ def get_column_names(
     return col_list, type_map
 
 
-def add_records_to_selection_table(engine: sqlalchemy.engine, n: int) -> List[int]:
-    "Returns a list of the Ids of the inserted records"
-    id_list = []
-    connection = engine.raw_connection()
+def add_records_to_selection_table(
+    engine: sqlalchemy.engine,
+    n: int,
+    connection: Optional[psycopg2.extensions.connection] = None,
+) -> List[int]:
+    """Inserts <n> records into the Selection table with a single statement.
+    Returns a list of the Ids of the inserted records. If <connection> is given, it is used
+    (and left open) and nothing is committed; otherwise the insertion is committed."""
+    if n <= 0:
+        return list()
+    if connection:
+        own_connection = False
+    else:
+        own_connection = True
+        connection = engine.raw_connection()
     cursor = connection.cursor()
-    q = sql.SQL('INSERT INTO "Selection" DEFAULT VALUES RETURNING "Id";')
-    for k in range(n):
-        cursor.execute(q)
-        id_list.append(cursor.fetchall()[0][0])
-    connection.commit()
+    # NB: Selection has only the Id column, whose default draws from the id sequence
+    q = sql.SQL(
+        'INSERT INTO "Selection" SELECT FROM generate_series(1, %s) RETURNING "Id";'
+    )
+    cursor.execute(q, [n])
+    id_list = [x for (x,) in cursor.fetchall()]
     cursor.close()
-    connection.close()
+    if own_connection:
+        connection.commit()
+        connection.close()
+    invalidate_name_id_cache(engine, "Selection")
     return id_list
 
 
+@contextmanager
+def selection_creation_transaction(
+    engine: sqlalchemy.engine.Engine,
+) -> Iterator[psycopg2.extensions.connection]:
+    """Yields a connection of its own, in a transaction holding the db-wide advisory lock
+    that serializes the creation of selections, so that concurrent loads (e.g., separate
+    processes) cannot create two Selections for the same candidate-party pair.
+    On exit the transaction is committed (or, if an exception was raised, rolled back),
+    which releases the lock and makes new selections visible to the next holder."""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s)", [constants.selection_lock_key]
+        )
+        cursor.close()
+        yield connection
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
 def jurisdiction_id_list(session: Session) -> List[int]:
     """
     Required inputs:
@@ -1049,25 +1283,242 @@ def active_vote_types(session: Session, election, jurisdiction):
     return active_list
 
 
+def refresh_rollup(
+    connection: psycopg2.extensions.connection, datafile_id: int
+) -> Optional[str]:
+    """Replaces the records in the _rollup table for the datafile <datafile_id> with the sums
+    of that datafile's VoteCount records over each ReportingUnit containing (or equal to) the
+    ReportingUnit of the count. Does not commit. Work is done within a savepoint, so that
+    failure leaves the caller's transaction usable. Returns error string (or None)"""
+    cursor = connection.cursor()
+    q = sql.SQL(
+        """
+        DELETE FROM "_rollup" WHERE "_datafile_Id" = %s;
+        INSERT INTO "_rollup" (
+            "_datafile_Id", "Election_Id", "ReportingUnitType", "ReportingUnit_Id",
+            "Contest_Id", "Selection_Id", "CountItemType", "Count"
+        )
+        SELECT  vc."_datafile_Id", vc."Election_Id", ru."ReportingUnitType",
+                cruj."ParentReportingUnit_Id", vc."Contest_Id", vc."Selection_Id",
+                vc."CountItemType", sum(vc."Count")
+        FROM    "VoteCount" vc
+                JOIN "ComposingReportingUnitJoin" cruj ON vc."ReportingUnit_Id" = cruj."ChildReportingUnit_Id"
+                JOIN "ReportingUnit" ru ON cruj."ParentReportingUnit_Id" = ru."Id"
+        WHERE   vc."_datafile_Id" = %s
+        GROUP BY vc."_datafile_Id", vc."Election_Id", ru."ReportingUnitType",
+                cruj."ParentReportingUnit_Id", vc."Contest_Id", vc."Selection_Id",
+                vc."CountItemType"
+        """
+    )
+    try:
+        cursor.execute("SAVEPOINT refresh_rollup")
+        cursor.execute(q, [datafile_id, datafile_id])
+        cursor.execute("RELEASE SAVEPOINT refresh_rollup")
+        err_str = None
+    except Exception as exc:
+        cursor.execute("ROLLBACK TO SAVEPOINT refresh_rollup")
+        err_str = f"Error refreshing rollup of vote counts for datafile id {datafile_id}: {exc}"
+    cursor.close()
+    return err_str
+
+
+def refresh_rollup_for_datafiles(
+    engine: sqlalchemy.engine.Engine, datafile_ids: List[int]
+) -> Optional[str]:
+    """Refreshes (see refresh_rollup) and commits the rolled-up counts of each datafile
+    in <datafile_ids>. Returns error string (or None)"""
+    err_str_list = list()
+    connection = engine.raw_connection()
+    try:
+        for datafile_id in datafile_ids:
+            err_str = refresh_rollup(connection, int(datafile_id))
+            if err_str:
+                err_str_list.append(err_str)
+            connection.commit()
+    finally:
+        connection.close()
+    if err_str_list:
+        return ";".join(err_str_list)
+    return None
+
+
+def refresh_rollup_for_reporting_units(
+    engine: sqlalchemy.engine.Engine, reporting_unit_ids: List[int]
+) -> Optional[str]:
+    """Refreshes the rolled-up counts of every datafile with vote counts for any of
+    the ReportingUnits in <reporting_unit_ids> (e.g., after their ancestors have changed).
+    Returns error string (or None)"""
+    if not reporting_unit_ids:
+        return None
+    try:
+        with pooled_cursor(engine) as cursor:
+            cursor.execute(
+                """SELECT DISTINCT "_datafile_Id" FROM "VoteCount"
+                WHERE "ReportingUnit_Id" = ANY(%s)""",
+                [[int(x) for x in reporting_unit_ids]],
+            )
+            datafile_ids = [idx for (idx,) in cursor.fetchall()]
+    except Exception as exc:
+        return f"Error finding datafiles whose rollup needs refreshing: {exc}"
+    return refresh_rollup_for_datafiles(engine, datafile_ids)
+
+
 def remove_record_from_datafile_table(session, idx) -> Optional[str]:
 
     err_str = None
     try:
         connection = session.bind.raw_connection()
         cursor = connection.cursor()
-        q = sql.SQL("""DELETE FROM _datafile WHERE "Id" = {idx}""").format(
-            idx=sql.Literal(str(idx))
-        )
+        q = sql.SQL(
+            """DELETE FROM "_rollup" WHERE "_datafile_Id" = {idx}; DELETE FROM _datafile WHERE "Id" = {idx}"""
+        ).format(idx=sql.Literal(str(idx)))
         cursor.execute(q)
         connection.commit()
         cursor.close()
         connection.close()
+        invalidate_name_id_cache(session.bind, "_datafile")
     except Exception as exc:
         err_str = f"Error deleting record from _datafile table: {exc}"
         print(err_str)
     return err_str
 
 
+def create_staging_schema(
+    engine: sqlalchemy.engine.Engine, schema: str
+) -> Optional[str]:
+    """Creates schema <schema> holding an empty copy of each table in
+    constants.staged_results_tables. Copies include defaults, so Ids of staged records
+    are drawn from the sequences of the live tables and can be moved to the live tables as is.
+    Returns error string (or None)"""
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            sql.SQL("CREATE SCHEMA {schema}").format(schema=sql.Identifier(schema))
+        )
+        for table in constants.staged_results_tables:
+            cursor.execute(
+                sql.SQL("CREATE TABLE {staged} (LIKE {live} INCLUDING ALL)").format(
+                    staged=sql.Identifier(schema, table),
+                    live=sql.Identifier("public", table),
+                )
+            )
+        connection.commit()
+        err_str = None
+    except Exception as exc:
+        connection.rollback()
+        err_str = f"Error creating staging schema {schema}: {exc}"
+    cursor.close()
+    connection.close()
+    return err_str
+
+
+def remove_staging_schema(
+    engine: sqlalchemy.engine.Engine, schema: str
+) -> Optional[str]:
+    """Drops schema <schema> (if it exists) and everything in it. Returns error string (or None)"""
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            sql.SQL("DROP SCHEMA IF EXISTS {schema} CASCADE").format(
+                schema=sql.Identifier(schema)
+            )
+        )
+        connection.commit()
+        err_str = None
+    except Exception as exc:
+        connection.rollback()
+        err_str = f"Error removing staging schema {schema}: {exc}"
+    cursor.close()
+    connection.close()
+    return err_str
+
+
+def latest_download_date(
+    session: Session, election_id: int, reporting_unit_id: int
+) -> str:
+    """Returns latest download date (yyyy-mm-dd) of datafiles for the given election and
+    jurisdiction in the _datafile table found via the session's search path
+    (or '0000-00-00' if there are none)"""
+    with pooled_cursor(session) as cursor:
+        cursor.execute(
+            """SELECT max(download_date) FROM _datafile
+            WHERE "Election_Id" = %s AND "ReportingUnit_Id" = %s""",
+            [election_id, reporting_unit_id],
+        )
+        (latest,) = cursor.fetchone()
+    if latest is None:
+        return "0000-00-00"
+    return latest.strftime("%Y-%m-%d")
+
+
+def datafile_content_hashes(
+    session: Session, election_id: int, reporting_unit_id: int
+) -> List[Optional[str]]:
+    """Returns content hashes (see ui.results_content_hash) of all datafiles for the given
+    election and jurisdiction in the _datafile table (None for any datafile loaded without a hash)"""
+    with pooled_cursor(session) as cursor:
+        cursor.execute(
+            """SELECT content_hash FROM _datafile
+            WHERE "Election_Id" = %s AND "ReportingUnit_Id" = %s""",
+            [election_id, reporting_unit_id],
+        )
+        hashes = [h for (h,) in cursor.fetchall()]
+    return hashes
+
+
+def swap_in_staged_results(
+    engine: sqlalchemy.engine.Engine,
+    schema: str,
+    election_id: int,
+    reporting_unit_id: int,
+) -> Optional[str]:
+    """In a single transaction, removes from the live tables all results of datafiles for the
+    given election and jurisdiction, moves all records of the staged tables in <schema> into
+    the live tables, and drops <schema>. <engine> must search the public schema
+    for unqualified table names. Returns error string (or None)"""
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    try:
+        old_ids, err_str = data_file_list_cursor(
+            cursor, election_id, reporting_unit_id=reporting_unit_id
+        )
+        if err_str:
+            raise Exception(err_str)
+        if old_ids:
+            cursor.execute(
+                """DELETE FROM "VoteCount" WHERE "_datafile_Id" = ANY(%s);
+                DELETE FROM "_rollup" WHERE "_datafile_Id" = ANY(%s);
+                DELETE FROM _datafile WHERE "Id" = ANY(%s);""",
+                [old_ids, old_ids, old_ids],
+            )
+        # NB: _datafile first, since staged records of other tables refer to it
+        for table in constants.staged_results_tables:
+            cursor.execute(
+                sql.SQL("INSERT INTO {live} SELECT * FROM {staged}").format(
+                    live=sql.Identifier("public", table),
+                    staged=sql.Identifier(schema, table),
+                )
+            )
+        cursor.execute(
+            sql.SQL("DROP SCHEMA {schema} CASCADE").format(
+                schema=sql.Identifier(schema)
+            )
+        )
+        connection.commit()
+        err_str = None
+    except Exception as exc:
+        connection.rollback()
+        err_str = f"Error swapping staged results from schema {schema} into live tables: {exc}"
+    cursor.close()
+    connection.close()
+    # records were removed from _datafile, and staged loading added element records
+    #  via other engines
+    invalidate_name_id_cache(engine)
+    return err_str
+
+
 def remove_vote_counts(session: Session, id: int) -> Optional[str]:
     """Remove all VoteCount data from a particular file, and remove that file from _datafile"""
     connection = session.bind.raw_connection()
@@ -1087,9 +1538,10 @@ def remove_vote_counts(session: Session, id: int) -> Optional[str]:
         connection.close()
         return f"No datafile found with Id = {id}: {exc}"
     try:
-        q = 'DELETE FROM "VoteCount" where "_datafile_Id"=%s;Delete from _datafile where "Id"=%s;'
-        cursor.execute(q, [id, id])
+        q = 'DELETE FROM "VoteCount" where "_datafile_Id"=%s;DELETE FROM "_rollup" where "_datafile_Id"=%s;Delete from _datafile where "Id"=%s;'
+        cursor.execute(q, [id, id, id])
         connection.commit()
+        invalidate_name_id_cache(session.bind, "_datafile")
         print(f"{file_name}: VoteCounts deleted from db for datafile id {id}\n")
         err_str = None
     except Exception as exc:
@@ -1151,7 +1603,7 @@ def get_relevant_contests(
     jurisdiction = name_from_id(session, "ReportingUnit", jurisdiction_id)
     subdivision_type = major_subdivision_dictionary[jurisdiction]
 
-    working = unsummed_vote_counts_with_rollup_subdivision_id(
+    working = rolled_up_vote_counts(
         session,
         election_id,
         jurisdiction_id,
@@ -1316,6 +1768,71 @@ def unsummed_vote_counts_with_rollup_subdivision_id(
     return result_df
 
 
+def rolled_up_vote_counts(
+    session: Session,
+    election_id: int,
+    jurisdiction_id: int,
+    subdivision_type: str,
+) -> pd.DataFrame:
+    """Returns candidate-contest vote counts for given election and jurisdiction, summed to each
+    subdivision (e.g. county) of type <subdivision_type>, read from the _rollup table. Columns are those of
+    unsummed_vote_counts_with_rollup_subdivision_id, except those describing the reporting unit
+    of each individual vote count.
+    """
+    q = sql.SQL(
+        """
+            SELECT  r."Count", r."Contest_Id", r."Selection_Id", r."Election_Id",
+                    r."ReportingUnit_Id" AS "ParentReportingUnit_Id",
+                    IntermediateRU."Name" AS "ParentName",
+                    r."ReportingUnitType" AS "ParentReportingUnitType",
+                    r."CountItemType", C."Name" AS "Contest",
+                    Cand."BallotName" AS "Selection",
+                    "ElectionDistrict_Id", ED."Name" as "ElectionDistrict",
+                    Cand."Id" AS "Candidate_Id",
+                    "contest_type",
+                    ED."ReportingUnitType" AS "contest_district_type",
+                    p."Name" as Party
+                    FROM "_rollup" r
+                    JOIN "_datafile" d ON r."_datafile_Id" = d."Id"
+                    JOIN "Contest" C ON r."Contest_Id" = C."Id"
+                    JOIN "CandidateContest" ON C."Id" = "CandidateContest"."Id"
+                    JOIN "Office" O ON "CandidateContest"."Office_Id" = O."Id"
+                    JOIN "ReportingUnit" ED ON O."ElectionDistrict_Id" = ED."Id" -- election district
+                    JOIN "ReportingUnit" IntermediateRU ON r."ReportingUnit_Id" = IntermediateRU."Id" -- reporting unit for county (or county-like)
+                    JOIN "CandidateSelection" CS ON CS."Id" = r."Selection_Id"
+                    JOIN "Candidate" Cand ON CS."Candidate_Id" = Cand."Id"
+                    JOIN "Party" p on CS."Party_Id" = p."Id"
+                WHERE d."Election_Id" = %s  -- election_id
+                    AND d."ReportingUnit_Id" = %s  -- jurisdiction_id
+                    AND r."ReportingUnitType" = %s --  subdivision type
+                    AND C.contest_type = 'Candidate'
+    """
+    )
+    with pooled_cursor(session) as cursor:
+        cursor.execute(q, [election_id, jurisdiction_id, subdivision_type])
+        result = cursor.fetchall()
+    columns = [
+        "Count",
+        "Contest_Id",
+        "Selection_Id",
+        "Election_Id",
+        "ParentReportingUnit_Id",
+        "ParentName",
+        "ParentReportingUnitType",
+        "CountItemType",
+        "Contest",
+        "Selection",
+        "ElectionDistrict_Id",
+        "ElectionDistrict",
+        "Candidate_Id",
+        "contest_type",
+        "contest_district_type",
+        "Party",
+    ]
+    result_df = pd.DataFrame(result, columns=columns)
+    return result_df
+
+
 def get_contest_with_unknown(
     session: Session, election_id: int, top_ru_id: int
 ) -> List[str]:
@@ -1343,9 +1860,14 @@ and cruj."ParentReportingUnit_Id" = %s
 
 
 def selection_ids_from_candidate_id(session: Session, candidate_id: int) -> List[int]:
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
+    with pooled_cursor(session) as cursor:
+        selection_id_list = selection_ids_from_candidate_id_cursor(cursor, candidate_id)
+    return selection_id_list
 
+
+def selection_ids_from_candidate_id_cursor(
+    cursor: psycopg2.extensions.cursor, candidate_id: int
+) -> List[int]:
     q = sql.SQL("""SELECT "Id" from "CandidateSelection" where "Candidate_Id" = %s""")
 
     cursor.execute(q, (candidate_id,))
@@ -1525,17 +2047,14 @@ def export_rollup_from_db(
         {count_item_type_sql} "CountItemType",
         sum(vc."Count") "Count" 
         {select_party}
-    FROM "VoteCount" vc
+    FROM "_rollup" vc
     LEFT JOIN _datafile d on vc."_datafile_Id" = d."Id"
     LEFT JOIN "Contest" C on vc."Contest_Id" = C."Id"
     {selection_join}
     {party_join}
     LEFT JOIN "Election" e on vc."Election_Id" = e."Id"
-    -- sum over all children
-    LEFT JOIN "ReportingUnit" ChildRU on vc."ReportingUnit_Id" = ChildRU."Id"
-    LEFT JOIN "ComposingReportingUnitJoin" CRUJ_sum on ChildRU."Id" = CRUJ_sum."ChildReportingUnit_Id"
-    -- roll up to the intermediate RUs
-    LEFT JOIN "ReportingUnit" IntermediateRU on CRUJ_sum."ParentReportingUnit_Id" =IntermediateRU."Id"
+    -- counts already summed over all children of the intermediate RUs
+    LEFT JOIN "ReportingUnit" IntermediateRU on vc."ReportingUnit_Id" =IntermediateRU."Id"
     -- intermediate RUs must nest in top RU
     LEFT JOIN "ComposingReportingUnitJoin" CRUJ_top on IntermediateRU."Id" = CRUJ_top."ChildReportingUnit_Id"
     LEFT JOIN "ReportingUnit" TopRU on CRUJ_top."ParentReportingUnit_Id" = TopRU."Id"
@@ -1543,7 +2062,7 @@ def export_rollup_from_db(
     WHERE C.contest_type = %s -- contest type
         AND e."Name" = %s -- election name
         AND TopRU."Name" = %s  -- top RU
-         AND %s = IntermediateRU."ReportingUnitType"  -- intermediate_reporting_unit_type
+         AND %s = vc."ReportingUnitType"  -- intermediate_reporting_unit_type
        AND d.{by} in %s  -- tuple of datafile short_names (if by='short_name) or Ids (if by="Id")
         {restrict}
     GROUP BY {group_and_order_by}
@@ -1570,6 +2089,7 @@ def export_rollup_from_db(
         results_df = pd.DataFrame()
         err_str = f"No results exported due to database error: {exc}"
     cursor.close()
+    connection.close()
     return results_df, err_str
 
 
@@ -1584,7 +2104,109 @@ def read_vote_count(
     election. But this table is the largest one, so we don't want to use pandas methods
     to read into a DF and then filter. Data returns is determined by <fields> (column names from SQL query);
     the columns in the returned database can be renamed as <aliases>"""
+    q = vote_count_query(fields, election_id=election_id, jurisdiction_id=jurisdiction_id)
+    with pooled_cursor(session) as cursor:
+        cursor.execute(q)
+        results = cursor.fetchall()
+    results_df = pd.DataFrame(results, columns=aliases)
+    return results_df
 
+
+def vote_counts_exist(
+    session: Session,
+    election_id: int,
+    jurisdiction_id: int,
+) -> bool:
+    """Returns True if the VoteCount table has any record for the election <election_id>
+    in a ReportingUnit nested in (or equal to) <jurisdiction_id>. Stops at the first such record,
+    so cost does not depend on the size of the VoteCount table."""
+    q = sql.SQL(
+        """
+        SELECT EXISTS (
+            SELECT 1
+            FROM "VoteCount" vc
+            JOIN "ComposingReportingUnitJoin" cruj 
+                ON vc."ReportingUnit_Id" = cruj."ChildReportingUnit_Id"
+            WHERE vc."Election_Id" = %s
+                AND cruj."ParentReportingUnit_Id" = %s
+        )
+        """
+    )
+    with pooled_cursor(session) as cursor:
+        cursor.execute(q, [election_id, jurisdiction_id])
+        exists = cursor.fetchone()[0]
+    return exists
+
+
+def external_data_exists(
+    session: Session,
+    election_id: int,
+    jurisdiction_id: int,
+) -> bool:
+    """Returns True if any external dataset associated to the election <election_id> has
+    data for a ReportingUnit nested in (or equal to) <jurisdiction_id>. Stops at the first such record."""
+    q = sql.SQL(
+        """
+        SELECT EXISTS (
+            SELECT 1
+            FROM "ElectionExternalDataSetJoin" eedsj
+            JOIN "ExternalData" ed ON eedsj."ExternalDataSet_Id" = ed."ExternalDataSet_Id"
+            JOIN "ComposingReportingUnitJoin" cruj 
+                ON ed."ReportingUnit_Id" = cruj."ChildReportingUnit_Id"
+            WHERE eedsj."Election_Id" = %s
+                AND cruj."ParentReportingUnit_Id" = %s
+        )
+        """
+    )
+    with pooled_cursor(session) as cursor:
+        cursor.execute(q, [election_id, jurisdiction_id])
+        exists = cursor.fetchone()[0]
+    return exists
+
+
+def read_vote_count_chunks(
+    session: Session,
+    election_id: Optional[int] = None,
+    jurisdiction_id: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    aliases: Optional[List[str]] = None,
+    order_by: Optional[List[str]] = None,
+    chunksize: int = constants.vote_count_chunksize,
+) -> Iterator[pd.DataFrame]:
+    """Generator version of read_vote_count, yielding dataframes of at most <chunksize> rows
+    read via a server-side cursor, so that memory use does not grow with the size of the VoteCount table.
+    If <order_by> (a list of items in <fields>) is given, rows are sorted by those fields.
+    The cursor is closed (and the connection returned to the pool) when the generator
+    is exhausted or closed."""
+    q = vote_count_query(
+        fields,
+        election_id=election_id,
+        jurisdiction_id=jurisdiction_id,
+        order_by=order_by,
+    )
+    connection = session.bind.raw_connection()
+    # NB: named cursor is a server-side cursor
+    cursor = connection.cursor(name="read_vote_count_chunks")
+    try:
+        cursor.itersize = chunksize
+        cursor.execute(q)
+        while True:
+            results = cursor.fetchmany(chunksize)
+            if not results:
+                break
+            yield pd.DataFrame(results, columns=aliases)
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def vote_count_query(
+    fields: List[str],
+    election_id: Optional[int] = None,
+    jurisdiction_id: Optional[int] = None,
+    order_by: Optional[List[str]] = None,
+) -> sql.Composed:
+    """Returns query for read_vote_count and read_vote_count_chunks"""
     # create the WHERE clause if necessary
     if not election_id and not jurisdiction_id:
         where = sql.SQL("")
@@ -1606,6 +2228,14 @@ def read_vote_count(
         else:
             where = sql.SQL("")
 
+    # create the ORDER BY clause if necessary
+    if order_by:
+        order = sql.SQL("ORDER BY {order_fields}").format(
+            order_fields=sql.SQL(",").join(sql.Identifier(f) for f in order_by)
+        )
+    else:
+        order = sql.SQL("")
+
     q = sql.SQL(
         """
         SELECT  DISTINCT {fields}
@@ -1635,17 +2265,14 @@ def read_vote_count(
                 JOIN (SELECT "Id" as "GP_Id", "Name" AS "GPReportingUnitName", "ReportingUnitType" AS "GPType" FROM "ReportingUnit") gpru on vc."ReportingUnit_Id" = gpru."GP_Id"
                 JOIN (SELECT "Id", "Name" as "ElectionName", "ElectionType" FROM "Election") e on vc."Election_Id" = e."Id"
         {where}
+        {order}
         """
     ).format(
         fields=sql.SQL(",").join(sql.Identifier(field) for field in fields),
         where=where,
+        order=order,
     )
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    cursor.execute(q)
-    results = cursor.fetchall()
-    results_df = pd.DataFrame(results, columns=aliases)
-    return results_df
+    return q
 
 
 def list_to_id(session: Session, element: str, names: List[str]) -> Optional[int]:
@@ -2093,18 +2720,21 @@ def get_vote_count_types(
     return vct_set
 
 
-def read_vote_count_nist(
+def read_vote_count_nist_chunks(
     session: Session,
     election_id: int,
     reporting_unit_id: int,
     rollup_ru_type: Optional[str] = None,
-) -> pd.DataFrame:
-    """The VoteCount table is the only place that maps contests to a specific
-    election. But this table is the largest one, so we don't want to use pandas methods
-    to read into a DF and then filter"""
-
+    chunksize: int = constants.vote_count_chunksize,
+) -> Iterator[pd.DataFrame]:
+    """Generator yielding dataframes of the vote counts (with the info needed for NIST export)
+    for the election <election_id> in ReportingUnits nested in <reporting_unit_id>, read a chunk
+    at a time via read_vote_count_chunks, sorted by contest, selection and CountItemType.
+    If <rollup_ru_type> is given, counts are rolled up to ReportingUnits of that type, and
+    no rolled-up count is split between chunks."""
+    # NB: the ReportingUnitType is the type of the Election District
     fields = [
-        "ReportingUnitType",
+        "unit_type",
         "Party_Id",
         "PartyName",
         "Candidate_Id",
@@ -2118,41 +2748,23 @@ def read_vote_count_nist(
         "CountItemType",
         "Count",
     ]
-    q = sql.SQL(
-        """
-        SELECT  DISTINCT {fields}
-        FROM    (
-                    SELECT  "Id" as "VoteCount_Id", "Contest_Id", "Selection_Id",
-                            "ReportingUnit_Id", "Election_Id", "CountItemType", 
-                             "Count"
-                    FROM    "VoteCount"
-                ) vc
-                JOIN (SELECT "Id", "Name" as "ContestName" , contest_type as "ContestType" FROM "Contest") con on vc."Contest_Id" = con."Id"
-                JOIN "ComposingReportingUnitJoin" cruj ON vc."ReportingUnit_Id" = cruj."ChildReportingUnit_Id"
-                JOIN "CandidateSelection" cs ON vc."Selection_Id" = cs."Id"
-                JOIN "Candidate" c on cs."Candidate_Id" = c."Id"
-                JOIN (SELECT "Id", "Name" AS "PartyName" FROM "Party") p ON cs."Party_Id" = p."Id"
-                JOIN "CandidateContest" cc ON con."Id" = cc."Id"
-                JOIN (SELECT "Id", "Name" as "OfficeName", "ElectionDistrict_Id" FROM "Office") o on cc."Office_Id" = o."Id"
-                -- this reporting unit info refers to the districts (state house, state senate, etc)
-                JOIN (SELECT "Id", "Name" AS "ElectionDistrict", "ReportingUnitType" FROM "ReportingUnit") ru on o."ElectionDistrict_Id" = ru."Id"
-                 -- this reporting unit info refers to the geopolitical divisions (county, state, etc)
-                JOIN (SELECT "Id" as "GP_Id", "Name" AS "GPReportingUnitName", "ReportingUnitType" AS "GPType" FROM "ReportingUnit") gpru on vc."ReportingUnit_Id" = gpru."GP_Id"
-                JOIN (SELECT "Id", "Name" as "ElectionName",  "ElectionType" FROM "Election") e on vc."Election_Id" = e."Id"
-        WHERE   "Election_Id" = %s
-                AND "ParentReportingUnit_Id" = %s
-        """
-    ).format(
-        fields=sql.SQL(",").join(sql.Identifier(field) for field in fields),
+    aliases = ["ReportingUnitType"] + fields[1:]
+    key_cols = ["Contest_Id", "Selection_Id", "CountItemType"]
+    chunks = read_vote_count_chunks(
+        session,
+        election_id=election_id,
+        jurisdiction_id=reporting_unit_id,
+        fields=fields,
+        aliases=aliases,
+        order_by=key_cols,
+        chunksize=chunksize,
     )
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    cursor.execute(q, [election_id, reporting_unit_id])
-    results = cursor.fetchall()
-    unrolled_df = pd.DataFrame(results, columns=fields)
+    if not rollup_ru_type:
+        yield from chunks
+        return
 
-    if rollup_ru_type:
-        results_df, new_err = an.rollup_dataframe(
+    def rolled_up(unrolled_df: pd.DataFrame) -> pd.DataFrame:
+        rolled_df, _ = an.rollup_dataframe(
             session,
             unrolled_df,
             "Count",
@@ -2161,10 +2773,54 @@ def read_vote_count_nist(
             rollup_rut=rollup_ru_type,
             ignore=["ReportingUnitType"],
         )
-        #  NB: the ReportingUnitType from read_vote_count is the Election District type
-    else:
-        results_df = unrolled_df
-    return results_df
+        return rolled_df
+
+    # rows sharing the key of the last row of a chunk may continue into the next chunk,
+    #  so hold them back until their key is complete
+    held = None
+    for chunk in chunks:
+        if held is not None:
+            chunk = pd.concat([held, chunk], ignore_index=True)
+        is_last_key = (chunk[key_cols] == chunk[key_cols].iloc[-1]).all(axis=1)
+        held = chunk[is_last_key]
+        if not is_last_key.all():
+            yield rolled_up(chunk[~is_last_key])
+    if held is not None:
+        yield rolled_up(held)
+
+
+def read_vote_count_nist(
+    session: Session,
+    election_id: int,
+    reporting_unit_id: int,
+    rollup_ru_type: Optional[str] = None,
+) -> pd.DataFrame:
+    """Returns dataframe of all chunks from read_vote_count_nist_chunks"""
+    chunk_list = list(
+        read_vote_count_nist_chunks(
+            session, election_id, reporting_unit_id, rollup_ru_type=rollup_ru_type
+        )
+    )
+    if chunk_list:
+        return pd.concat(chunk_list)
+    columns = [
+        "ReportingUnitType",
+        "Party_Id",
+        "PartyName",
+        "Candidate_Id",
+        "BallotName",
+        "Contest_Id",
+        "ContestType",
+        "ElectionDistrict_Id",
+        "ContestName",
+        "Selection_Id",
+        "ReportingUnit_Id",
+        "CountItemType",
+        "Count",
+    ]
+    if rollup_ru_type:
+        columns.remove("ReportingUnitType")
+    return pd.DataFrame(columns=columns)
 
 
 def create_common_data_format_tables(session, dirpath="CDF_schema_def_info/"):
@@ -2198,31 +2854,13 @@ def create_common_data_format_tables(session, dirpath="CDF_schema_def_info/"):
                 break
             except IndexError:
                 pass
-        # create indices for efficiency
-        if element == "VoteCount":
-            create_indices = [
-                "CountItemType",
-                "ReportingUnit_Id",
-                "Contest_Id",
-                "Selection_Id",
-                "Election_Id",
-                "_datafile_Id",
-            ]
-        elif element == "CandidateSelection":
-            create_indices = ["Candidate_Id", "Party_Id"]
-        else:
-            # create_indices = [[get_name_field(element)]]
-            create_indices = None
-            # TODO fix for efficiency -- note <contest_type>Contest, <contest_type>Selection may need special treatment
-
-        # create db table for element
+        # create db table for element (with indices from indexes.txt, if any)
         create_table(
             metadata,
             id_seq,
             element,
             "elements",
             dirpath,
-            create_indices=create_indices,
         )
         # remove element from list of yet-to-be-processed
         elements_to_process.remove(element)
@@ -2234,10 +2872,6 @@ def create_common_data_format_tables(session, dirpath="CDF_schema_def_info/"):
     joins_to_process = [f for f in os.listdir(join_path) if f[0] != "."]
     while joins_to_process:
         j = joins_to_process[0]
-        if j == "ComposingReportingUnitJoin":
-            create_indices = ["ParentReportingUnit_Id", "ChildReportingUnit_Id"]
-        else:
-            create_indices = None
         # check foreign keys; if any refers to an elt yet to be processed, change to that elt
         #  note that any foreign keys for elements are to other elements, so it's OK to do this without considering
         #  joins first or concurrently.
@@ -2253,8 +2887,8 @@ def create_common_data_format_tables(session, dirpath="CDF_schema_def_info/"):
                 break
             except IndexError:
                 pass
-        # create db table for element
-        create_table(metadata, id_seq, j, "Joins", dirpath, create_indices)
+        # create db table for element (with indices from indexes.txt, if any)
+        create_table(metadata, id_seq, j, "Joins", dirpath)
 
         # remove element from list of yet-to-be-processed
         joins_to_process.remove(j)
@@ -2265,11 +2899,11 @@ def create_common_data_format_tables(session, dirpath="CDF_schema_def_info/"):
     return metadata
 
 
-def create_table(
-    metadata, id_seq, name, table_type, dirpath, create_indices: list = None
-):
-    """Each element of the list <create_indices>, should be a list of
-    columns on which an index should be created."""
+def create_table(metadata, id_seq, name, table_type, dirpath):
+    """Indices are read from the file indexes.txt in the table's directory, if it exists:
+    one index per row, with (comma-separated) columns in the index_columns field and (optional)
+    postgresql operator class in the operator_class field, e.g., text_pattern_ops for an index
+    supporting prefix (LIKE 'abc%') searches."""
     t_path = os.path.join(dirpath, table_type, name)
     if name == "Selection":
         # Selection table has only Id column
@@ -2341,9 +2975,13 @@ def create_table(
             UniqueConstraint(*all_content_fields, name=f"{short_name}_no_dupes")
         )
 
-        # add timestamp to _datafile
+        # add timestamp and hash of input file contents to _datafile
+        #  (neither is part of the no-dupes constraint)
         if name == "_datafile":
-            time_stamp_list = [Column("created_at", sa.DateTime, default=sa.func.now())]
+            time_stamp_list = [
+                Column("created_at", sa.DateTime, default=sa.func.now()),
+                Column("content_hash", sa.String),
+            ]
         else:
             time_stamp_list = []
         if name in [
@@ -2424,9 +3062,18 @@ def create_table(
     else:
         raise Exception(f"table_type {table_type} not recognized")
     # create indices for efficiency
-    if create_indices:
-        for li in create_indices:
-            Index(f"{t}_{li}_idx", t.c[li])
+    index_file = os.path.join(t_path, "indexes.txt")
+    if os.path.isfile(index_file):
+        indexes = pd.read_csv(index_file, sep="\t").fillna("")
+        for i, r in indexes.iterrows():
+            cols = r["index_columns"].split(",")
+            if r["operator_class"]:
+                ops = {c: r["operator_class"] for c in cols}
+                idx_name = f'{t}_{"_".join(cols)}_{r["operator_class"]}_idx'
+            else:
+                ops = dict()
+                idx_name = f'{t}_{"_".join(cols)}_idx'
+            Index(idx_name, *[t.c[c] for c in cols], postgresql_ops=ops)
     return
 
 
@@ -2545,6 +3192,7 @@ def reset_db(session, dirpath):
     Used if a DB is created for a user but not populated, for example."""
 
     eng = session.bind
+    invalidate_name_id_cache(eng)
     conn = eng.connect()
     conn.execute("DROP SEQUENCE IF EXISTS id_seq CASCADE;")
     session.commit()
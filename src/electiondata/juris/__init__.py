@@ -407,7 +407,7 @@ def clean_and_dedupe(f_path: str, clean_candidates=False):
         if not is_numeric_dtype(df.dtypes[c]):
             df[c].fillna("", inplace=True)
             try:
-                df[c] = df[c].apply(m.compress_whitespace)
+                df[c] = m.map_unique_values(df[c], m.compress_whitespace_values)
             except Exception:
                 # failure shouldn't break anything
                 print(f"No whitespace compression on column {c} of {f_path}")
@@ -604,14 +604,12 @@ def load_juris_dframe_into_cdf(
     if os.path.isfile(fk_file):
         foreign_keys = pd.read_csv(fk_file, sep="\t", index_col="fieldname")
 
-        for fn in foreign_keys.index:
-            ref = foreign_keys.loc[
-                fn, "refers_to"
-            ]  # NB: juris elements have no multiple referents (as joins may)
-            col_map = {fn[:-3]: db.get_name_field(ref)}
-            df = db.append_id_to_dframe(session.bind, df, ref, col_map=col_map).rename(
-                columns={f"{ref}_Id": fn}
-            )
+        # NB: juris elements have no multiple referents (as joins may)
+        id_map = {
+            fn: (fn[:-3], foreign_keys.loc[fn, "refers_to"])
+            for fn in foreign_keys.index
+        }
+        df = db.append_ids_by_name(session.bind, df, id_map)
 
     # commit info in df to corresponding cdf table to db
     new_err = db.insert_to_cdf_db(
@@ -734,30 +732,19 @@ def load_or_update_contests(
         if ui.fatal_error(new_err):
             return err
 
-    # append Contest_Id
-    col_map = {"Name": "Name", "contest_type": "contest_type"}
-    df = db.append_id_to_dframe(engine, df, "Contest", col_map=col_map)
+    # append Contest_Id (NB: name-Id map for <contest_type>Contest has only contests of that type)
+    id_map = {"Contest_Id": ("Name", f"{contest_type}Contest")}
 
     if contest_type == "BallotMeasure":
         # append ElectionDistrict_Id, Election_Id
-        for fk, ref in [
-            ("ElectionDistrict", "ReportingUnit"),
-            ("Election", "Election"),
-        ]:
-            col_map = {fk: "Name"}
-            df = (
-                db.append_id_to_dframe(engine, df, ref, col_map=col_map)
-                .rename(columns={f"{ref}_Id": f"{fk}_Id"})
-                .drop(fk, axis=1)
-            )
-
+        fk_refs = [("ElectionDistrict", "ReportingUnit"), ("Election", "Election")]
     else:
         # append Office_Id, PrimaryParty_Id
-        for fk, ref in [("Office", "Office"), ("PrimaryParty", "Party")]:
-            col_map = {fk: "Name"}
-            df = db.append_id_to_dframe(engine, df, ref, col_map=col_map).rename(
-                columns={f"{ref}_Id": f"{fk}_Id"}
-            )
+        fk_refs = [("Office", "Office"), ("PrimaryParty", "Party")]
+    id_map.update({f"{fk}_Id": (fk, ref) for fk, ref in fk_refs})
+    df = db.append_ids_by_name(engine, df, id_map)
+    if contest_type == "BallotMeasure":
+        df = df.drop([fk for fk, ref in fk_refs], axis=1)
 
     # create entries in <contest_type>Contest table
     # commit info in df to <contest_type>Contest table to db
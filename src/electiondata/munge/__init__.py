@@ -7,11 +7,13 @@ from electiondata import (
     juris as jm,
     constants,
 )
+import numpy as np
 import pandas as pd
-from pandas.api.types import is_numeric_dtype
-from typing import Optional, List, Dict, Any
+from pandas.api.types import is_numeric_dtype, union_categoricals
+from typing import Optional, List, Dict, Any, Tuple, Callable
 import re
 import os
+import psycopg2
 from sqlalchemy.orm.session import Session, engine
 import copy
 
@@ -81,6 +83,15 @@ def clean_strings(
     working = df.copy()
 
     for c in cols:
+        # for categorical columns, clean just the categories
+        if isinstance(working[c].dtype, pd.CategoricalDtype):
+            working[c] = map_unique_values(
+                working[c],
+                lambda x: clean_string_values(
+                    x.astype("string").fillna("").astype("object")
+                ),
+            )
+            continue
         # cast all specified columns as strings
         try:
             working[c] = working[c].astype("string")
@@ -90,22 +101,89 @@ def clean_strings(
         if c in cols:
             # change nulls to the empty string
             working[c] = working[c].fillna("")
-            # replace any double quotes with single quotes
-            try:
-                # replace any " by '
-                mask = working[c].str.contains('"').fillna(False)
-                working.loc[mask, c] = working[c].str.replace('"', "'")[mask]
-            except AttributeError or TypeError:
-                pass
+            # replace any " by ' and strip extraneous whitespace from any value recognized as string,
+            #  cleaning each distinct value only once
+            #  NB: cleaned column has object dtype
             try:
-                # strip extraneous whitespace from any value recognized as string
-                mask = working[c].apply(lambda x: isinstance(x, str))
-                working.loc[mask, c] = working[c][mask].apply(compress_whitespace)
+                working[c] = map_unique_values(working[c], clean_string_values)
             except (AttributeError, TypeError):
                 pass
     return working
 
 
+# pandas 1.5 replaced factorize's na_sentinel argument with use_na_sentinel (and pandas 2 removed it)
+_factorize_uses_na_sentinel = (
+    "use_na_sentinel" not in inspect.signature(pd.factorize).parameters
+)
+
+
+def factorize_keeping_nulls(values: Any) -> (np.ndarray, Any):
+    """Same as pd.factorize, but with null treated as a value of its own (with its own code
+    and its own entry in the uniques) rather than coded -1"""
+    if _factorize_uses_na_sentinel:
+        return pd.factorize(values, na_sentinel=None)
+    return pd.factorize(values, use_na_sentinel=False)
+
+
+def map_unique_values(
+    s: pd.Series, f: Callable[[pd.Series], pd.Series]
+) -> pd.Series:
+    """Returns series with the same index as <s>, whose values are given by <f>, where <f> takes
+    a series and returns an elementwise-transformed series of the same length.
+    <f> is applied only to the distinct values of <s> (including any null), so each
+    distinct value is transformed only once. If <s> is categorical, so is the returned series"""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # distinct values are the categories, plus null (whose code is -1)
+        categories = s.cat.categories
+        codes = s.cat.codes.to_numpy()
+        codes = np.where(codes == -1, len(categories), codes)
+        uniques = list(categories) + [np.nan]
+    else:
+        codes, uniques = factorize_keeping_nulls(s)
+    transformed = f(pd.Series(uniques, dtype="object")).to_numpy(dtype="object")
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        new_codes, new_categories = pd.factorize(transformed)
+        return pd.Series(
+            pd.Categorical.from_codes(new_codes[codes], categories=new_categories),
+            index=s.index,
+            name=s.name,
+        )
+    return pd.Series(transformed[codes], index=s.index, name=s.name, dtype="object")
+
+
+def fill_nulls(s: pd.Series, value: Any) -> pd.Series:
+    """Returns copy of <s> with nulls replaced by <value>, adding <value> to the categories
+    of a categorical <s> if necessary"""
+    if (
+        isinstance(s.dtype, pd.CategoricalDtype)
+        and (value not in s.cat.categories)
+        and s.isnull().any()
+    ):
+        s = s.cat.add_categories([value])
+    return s.fillna(value)
+
+
+def decategorize(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns copy of <df> with any categorical columns cast to object"""
+    working = df.copy()
+    for c in working.columns:
+        if isinstance(working[c].dtype, pd.CategoricalDtype):
+            working[c] = working[c].astype("object")
+    return working
+
+
+def clean_string_values(values: pd.Series) -> pd.Series:
+    """Replaces double quotes by single quotes and compresses whitespace in each string in
+    <values>; non-string items are left alone"""
+    is_str = values.map(lambda x: isinstance(x, str)).astype(bool)
+    cleaned = values.copy()
+    if is_str.any():
+        cleaned[is_str] = compress_whitespace_values(
+            values[is_str].str.replace('"', "'", regex=False)
+        )
+    return cleaned
+
+
 def add_regex_column(
     df: pd.DataFrame,
     old_col: str,
@@ -133,18 +211,19 @@ def add_regex_column(
     working = df.copy()
     try:
         p = re.compile(pattern_str)
-        # replace via regex if possible; otherwise msg
-        # # put informative error message in new_col (to be overwritten if no error)
-        old = working[old_col].copy()
-        working[new_col] = (
-            working[old_col] + f"{constants.regex_failure_string} {pattern_str}"
-        )
 
-        # # where regex succeeds, replace error message with good value
-        mask = working[old_col].str.match(p)
-        working.loc[mask, new_col] = working[mask][old_col].str.extract(
-            pattern_str, expand=False
-        )
+        def apply_regex(old: pd.Series) -> pd.Series:
+            # replace via regex if possible; otherwise msg
+            # # put informative error message in new column (to be overwritten if no error)
+            new = old + f"{constants.regex_failure_string} {pattern_str}"
+            # # where regex succeeds, replace error message with good value
+            # # (nulls, e.g. from blank cells, are not matched and stay null)
+            mask = old.str.match(p).fillna(False).astype(bool)
+            new.loc[mask] = old[mask].str.extract(pattern_str, expand=False)
+            return new
+
+        # apply regex once for each distinct value
+        working[new_col] = map_unique_values(working[old_col], apply_regex)
 
     except re.error as e:
         err = ui.add_new_error(
@@ -161,10 +240,24 @@ def add_regex_column(
     return working, err
 
 
+# parsed formulas, keyed by formula
+_parsed_formulas: Dict[str, Tuple[List[Tuple[str, str]], List[str]]] = dict()
+
+
 def text_fragments_and_fields(formula: str) -> (List[List[str]], str):
     """Given a formula with fields enclosed in angle brackets,
     return a list of text-fragment,field pairs (in order of appearance) and a final text fragment.
-    E.g., if formula is <County>;<Precinct>, returned are [(None,County),(';',Precinct)] and None."""
+    E.g., if formula is <County>;<Precinct>, returned are [(None,County),(';',Precinct)] and None.
+    Each formula is parsed only once."""
+    if formula not in _parsed_formulas.keys():
+        _parsed_formulas[formula] = parse_formula(formula)
+    text_field_list, last_text = _parsed_formulas[formula]
+    # return copies, so that callers' changes don't affect cached values
+    return list(text_field_list), list(last_text)
+
+
+def parse_formula(formula: str) -> (List[Tuple[str, str]], List[str]):
+    """Does the work of text_fragments_and_fields"""
     # use regex to apply formula (e.g., decode '<County>;<Precinct>'
     p = re.compile(
         "(?P<text>[^<>]*)<(?P<field>[^<>]+)>"
@@ -217,11 +310,7 @@ def add_column_from_formula(
             text_field_list = [(t, f"{f}{suffix}") for (t, f) in text_field_list]
 
         # add column to <working> dataframe via the concatenation formula
-        if last_text:
-            working = add_constant_column(
-                working, new_col, last_text[0], dtype="string"
-            )
-        else:
+        if not last_text:
             err = ui.add_new_error(
                 err,
                 "system",
@@ -229,19 +318,36 @@ def add_column_from_formula(
                 f"No last_text found by text_fragments_and_fields for {formula}",
             )
             return working, err
-        text_field_list.reverse()
-        for t, f in text_field_list:
-            try:
-                working[new_col] = t + working[f].map(str) + working[new_col].map(str)
-            except KeyError as ke:
-                err = ui.add_new_error(
-                    err,
-                    "munger",
-                    munger_name,
-                    f"Expected transformed column '{f}' not found, "
-                    f"perhaps because of mismatch between munger and results file. KeyError: {ke}",
-                )
-                return working, err
+        if not text_field_list:
+            working = add_constant_column(
+                working, new_col, last_text[0], dtype="string"
+            )
+        else:
+            text_field_list.reverse()
+            for t, f in text_field_list:
+                if f not in working.columns:
+                    err = ui.add_new_error(
+                        err,
+                        "munger",
+                        munger_name,
+                        f"Expected transformed column '{f}' not found, "
+                        f"perhaps because of mismatch between munger and results file. KeyError: '{f}'",
+                    )
+                    return working, err
+            # evaluate formula once for each distinct combination of field values,
+            #  then broadcast to all rows
+            fields = list(dict.fromkeys([f for (t, f) in text_field_list]))
+            codes, first_positions = distinct_row_codes(working[fields])
+            distinct = working[fields].iloc[first_positions]
+            value = pd.Series(last_text[0], index=distinct.index, dtype="string")
+            for t, f in text_field_list:
+                value = t + distinct[f].astype("object").map(str) + value.map(str)
+            # new column is categorical, as its values are typically much repeated
+            value_codes, categories = pd.factorize(value.to_numpy(dtype="object"))
+            working[new_col] = pd.Series(
+                pd.Categorical.from_codes(value_codes[codes], categories=categories),
+                index=working.index,
+            )
 
     except Exception as e:
         err = ui.add_new_error(
@@ -257,6 +363,34 @@ def add_column_from_formula(
     return working, err
 
 
+def distinct_row_codes(df: pd.DataFrame) -> (np.ndarray, np.ndarray):
+    """Returns an array of codes, one for each row of <df>, with rows sharing a code exactly
+    when they have the same values (nulls matching nulls), with codes numbered in order of first appearance;
+    and an array of the position of the first row with each code"""
+    codes = np.zeros(df.shape[0], dtype="int64")
+    for c in df.columns:
+        column_codes, column_uniques = factorize_keeping_nulls(df[c])
+        codes, _ = pd.factorize(codes * len(column_uniques) + column_codes)
+    _, first_positions = np.unique(codes, return_index=True)
+    return codes, first_positions
+
+
+def compress_whitespace_values(values: pd.Series) -> pd.Series:
+    """Vectorized version of compress_whitespace, using pandas string methods.
+    As with compress_whitespace, any non-string item becomes the empty string"""
+    is_str = values.map(lambda x: isinstance(x, str)).astype(bool)
+    compressed = pd.Series("", index=values.index, dtype="object")
+    if is_str.any():
+        compressed[is_str] = (
+            values[is_str]
+            .astype("object")
+            .str.replace(r"(\s)\s+", "\\1", regex=True)
+            .str.strip()
+            .str.replace("\n", " ", regex=False)
+        )
+    return compressed
+
+
 def compress_whitespace(s: Optional[str]) -> str:
     """Return a string where every instance of consecutive whitespaces internal to <s> has been replace
     by the first of those consecutive whitespace characters,
@@ -308,21 +442,78 @@ def raw_to_internal_dictionary_df(
     return dictionary
 
 
+class CompiledDictionary:
+    def __init__(self, dictionary_df: pd.DataFrame, path: str):
+        """
+        Required inputs:
+            dictionary_df: pd.DataFrame, contents of a dictionary.txt file
+            path: str, path to the dictionary.txt file (for error reporting)
+
+        Returns CompiledDictionary instance with attributes:
+            path
+            frames, dictionary of two-column dataframes (<element>, <element>_raw), one per element
+                (raw Candidate names regularized, as they will be in munged results)
+            raw_to_internal, dictionary of maps from raw identifier to internal name, one per element
+                (None for any element whose raw identifiers do not determine a single internal name)
+        """
+        self.path = path
+        self.frames = dict()
+        self.raw_to_internal = dict()
+        for element in dictionary_df["cdf_element"].unique():
+            frame = raw_to_internal_dictionary_df(dictionary_df, element)
+            if element == "Candidate":
+                frame["Candidate_raw"] = regularize_candidate_names(
+                    frame["Candidate_raw"]
+                )
+                # NB: regularizing can create duplicates (e.g., HILLARY CLINTON and Hillary Clinton regularize to the same)
+                frame.drop_duplicates(inplace=True)
+            self.frames[element] = frame
+            raw = frame[f"{element}_raw"]
+            if raw.notnull().all() and raw.is_unique:
+                self.raw_to_internal[element] = dict(zip(raw, frame[element]))
+            else:
+                self.raw_to_internal[element] = None
+
+    def frame(self, element: str) -> pd.DataFrame:
+        """Returns two-column dataframe (<element>, <element>_raw) for <element>. Not to be modified"""
+        if element in self.frames.keys():
+            return self.frames[element]
+        else:
+            return pd.DataFrame(columns=[element, f"{element}_raw"])
+
+
+# compiled dictionaries, keyed by path, along with modification time of file when compiled
+_compiled_dictionaries: Dict[str, Tuple[float, CompiledDictionary]] = dict()
+
+
+def compiled_dictionary(dictionary_path: str) -> CompiledDictionary:
+    """Returns compiled version of the dictionary file at <dictionary_path>, compiling
+    only if the file has changed since it was last compiled"""
+    key = os.path.abspath(dictionary_path)
+    mtime = os.path.getmtime(key)
+    if key in _compiled_dictionaries.keys():
+        compiled_mtime, compiled = _compiled_dictionaries[key]
+        if compiled_mtime == mtime:
+            return compiled
+    compiled = CompiledDictionary(pd.read_csv(key, sep="\t"), dictionary_path)
+    _compiled_dictionaries[key] = (mtime, compiled)
+    return compiled
+
+
 def replace_raw_with_internal_name(
     df: pd.DataFrame,
     munger_name: str,  # for error reporting
     file_name: str,  # for error reporting
     element: str,
-    dictionary_df: pd.DataFrame,
-    dictionary_path: str,
+    dictionary: CompiledDictionary,
     drop_unmatched: bool = False,
     drop_all_ok: bool = False,
 ) -> (pd.DataFrame, Optional[dict]):
-    """Uses dictionary_df to replace raw names with names
-    matching internal db standard. dictionary_path is for error reporting"""
+    """Uses <dictionary> to replace raw names with names
+    matching internal db standard."""
     err = None
     working = df.copy()
-    dictionary = raw_to_internal_dictionary_df(dictionary_df, element)
+    dictionary_path = dictionary.path
 
     # report values not matched by regex
     regex_fail_mask = working[f"{element}_raw"].str.contains(
@@ -340,19 +531,21 @@ def replace_raw_with_internal_name(
             working = working[~regex_fail_mask]
 
     if element == "Candidate":
-        # Regularize candidate names from results file and from dictionary.txt
+        # Regularize candidate names from results file (those from dictionary.txt were regularized on compilation)
         working.Candidate_raw = regularize_candidate_names(working.Candidate_raw)
-        dictionary[f"Candidate_raw"] = regularize_candidate_names(
-            dictionary[f"Candidate_raw"]
-        )
-        # NB: regularizing can create duplicates (e.g., HILLARY CLINTON and Hillary Clinton regularize to the same)
-        dictionary.drop_duplicates(inplace=True)
 
-    working = working.merge(
-        dictionary,
-        how="left",
-        on=f"{element}_raw",
-    )
+    raw_to_internal = dictionary.raw_to_internal.get(element)
+    if raw_to_internal is not None:
+        working = working.reset_index(drop=True)
+        working[element] = map_unique_values(
+            working[f"{element}_raw"], lambda x: x.map(raw_to_internal)
+        )
+    else:
+        working = working.merge(
+            dictionary.frame(element),
+            how="left",
+            on=f"{element}_raw",
+        )
 
     # identify where regex succeeded but result unmatched in dictionary
     unmatched = working[working[element].isnull() & working[f"{element}_raw"].notnull()]
@@ -393,7 +586,7 @@ def replace_raw_with_internal_name(
 
     # unmatched elements get nan in fields from dictionary table. Change these to "none or unknown"
     if not drop_unmatched:
-        working[element] = working[element].fillna("none or unknown")
+        working[element] = fill_nulls(working[element], "none or unknown")
 
     return working, err
 
@@ -485,8 +678,7 @@ def replace_raw_with_internal_ids(
     table_df: pd.DataFrame,
     element: str,
     internal_name_column: str,
-    dictionary_df: pd.DataFrame,
-    dictionary_path: str,
+    dictionary: CompiledDictionary,
     drop_unmatched: bool = False,
     unmatched_id: int = 0,
     drop_all_ok: bool = False,
@@ -502,8 +694,7 @@ def replace_raw_with_internal_ids(
         munger_name,
         file_name,
         element,
-        dictionary_df,
-        dictionary_path,
+        dictionary,
         drop_unmatched=drop_unmatched,
         drop_all_ok=drop_all_ok,
     )
@@ -541,10 +732,13 @@ def get_non_standard(
 def regularize_candidate_names(
     candidate_column: pd.Series,
 ) -> pd.Series:
+    # for categorical column, regularize just the categories
+    if isinstance(candidate_column.dtype, pd.CategoricalDtype):
+        return map_unique_values(candidate_column, regularize_candidate_names)
     ws = candidate_column.copy()
 
     # compress whitespace
-    ws = ws.apply(compress_whitespace)
+    ws = map_unique_values(ws, compress_whitespace_values)
 
     mask = ws.str.isupper()
     # if original is all caps
@@ -576,23 +770,23 @@ def melt_to_one_count_column(
     file_name: str,
     sheet_name: Optional[str] = None,
 ) -> (pd.DataFrame, Optional[dict]):
-    """transform to df with single count column and all raw munge info in other columns"""
+    """transform to df with single count column and all raw munge info in other columns.
+    Each header row of the count columns becomes a categorical column, as do the other columns"""
     err = None
     multi = isinstance(df.columns, pd.MultiIndex)
     # drop any empty columns (and remove them from count_columns list)
     df = ui.disambiguate_empty_cols(df, drop_empties=False)
+    # represent each column header as a tuple (one entry per header row)
     if multi:
-        # transform multi-index to plain index
-        df.columns = [";:;".join([f"{x}" for x in tup]) for tup in df.columns]
-        count_cols_compatible = [
-            ";:;".join([f"{x}" for x in tup]) for tup in count_columns_by_name
-        ]
+        headers = [tuple(f"{x}" for x in tup) for tup in df.columns]
+        count_headers = {tuple(f"{x}" for x in tup) for tup in count_columns_by_name}
     else:
-        count_cols_compatible = count_columns_by_name
-    count_cols = {c for c in count_cols_compatible if c in df.columns}
+        headers = [(c,) for c in df.columns]
+        count_headers = {(c,) for c in count_columns_by_name}
+    count_positions = [j for j in range(len(headers)) if headers[j] in count_headers]
 
     # NB merged cells in excel can lead to spurious empty columns
-    if not count_cols:
+    if not count_positions:
         if sheet_name:
             extra = f" on sheet {sheet_name}"
         else:
@@ -601,43 +795,59 @@ def melt_to_one_count_column(
 
         err = ui.add_new_error(err, "file", file_name, msg)
         return pd.DataFrame(), err
+
     # melt so that there is one single count column
-    id_columns = {c for c in df.columns if c not in count_cols}
-    melted = df.melt(
-        id_vars=id_columns,
-        value_vars=count_cols,
-        var_name="header_0",
-        value_name="Count",
-    )
-    if multi:
+    #  (as with pd.melt, rows for first count column, then rows for second count column, etc.)
+    id_positions = [j for j in range(len(headers)) if j not in count_positions]
+    n = df.shape[0]
+    k = len(count_positions)
+    if multi and id_positions:
+        # name string fields (id columns) by their entry in the noncount_header_row
         tab_to_df = df_header_rows_from_sheet_header_rows(p)
-        new_columns = list(melted.columns)
-        # remove extraneous text from column multi-headers for string fields (id_columns),
-        #  leaving only noncount_header_row
-        for idx in range(melted.shape[1]):
-            if melted.columns[idx] in id_columns:
-                new_columns[idx] = melted.columns[idx].split(";:;")[
-                    tab_to_df[p["noncount_header_row"]]
-                ]
-        melted.columns = new_columns
-
-        if "in_count_headers" in p["munge_field_types"]:
-            # split header_0 column into separate columns
-            # # get header_rows
-            # TODO: the following throws PerformanceError for Kansas House of Representatives 2020g. Rather than
-            #  assigning values, need to use melted = pd.concat([melted, <new_columns>])
-            melted[
-                [f"count_header_{idx}" for idx in p["count_header_row_numbers"]]
-            ] = pd.DataFrame(melted["header_0"].str.split(";:;", expand=True).values)[
-                [tab_to_df[idx] for idx in p["count_header_row_numbers"]]
-            ]
-            melted.drop("header_0", axis=1, inplace=True)
+        id_names = [
+            headers[j][tab_to_df[p["noncount_header_row"]]] for j in id_positions
+        ]
+    else:
+        id_names = [df.columns[j] for j in id_positions]
+    # the count column each melted row came from
+    count_column_codes = np.repeat(np.arange(k), n)
+
+    melted = pd.DataFrame(index=pd.RangeIndex(n * k))
+    for j, name in zip(id_positions, id_names):
+        codes, uniques = pd.factorize(df.iloc[:, j])
+        melted[name] = pd.Categorical.from_codes(np.tile(codes, k), categories=uniques)
+    if multi and ("in_count_headers" in p["munge_field_types"]):
+        # one column for each header row referenced in munge formulas
+        tab_to_df = df_header_rows_from_sheet_header_rows(p)
+        header_columns = {
+            f"count_header_{idx}": [headers[j][tab_to_df[idx]] for j in count_positions]
+            for idx in p["count_header_row_numbers"]
+        }
+    elif multi:
+        header_columns = {
+            "header_0": [";:;".join(headers[j]) for j in count_positions]
+        }
     elif len(p["count_header_row_numbers"]) == 1:
         count_header_row = p["count_header_row_numbers"][0]
-        # rename header_0 to count_header_i
-        melted.rename(
-            columns={"header_0": f"count_header_{count_header_row}"}, inplace=True
-        )
+        header_columns = {
+            f"count_header_{count_header_row}": [headers[j][0] for j in count_positions]
+        }
+    else:
+        header_columns = {"header_0": [headers[j][0] for j in count_positions]}
+    if not (multi and ("in_count_headers" in p["munge_field_types"])):
+        # header column precedes Count, as with pd.melt
+        for name, values in header_columns.items():
+            codes, uniques = pd.factorize(pd.Series(values, dtype="object"))
+            melted[name] = pd.Categorical.from_codes(
+                codes[count_column_codes], categories=uniques
+            )
+    melted["Count"] = df.iloc[:, count_positions].to_numpy().ravel(order="F")
+    if multi and ("in_count_headers" in p["munge_field_types"]):
+        for name, values in header_columns.items():
+            codes, uniques = pd.factorize(pd.Series(values, dtype="object"))
+            melted[name] = pd.Categorical.from_codes(
+                codes[count_column_codes], categories=uniques
+            )
     return melted, err
 
 
@@ -672,8 +882,7 @@ def add_contest_id(
     munger_name: str,
     err: Optional[dict],
     session: Session,
-    dictionary_df: pd.DataFrame,
-    dictionary_path: str,
+    dictionary: CompiledDictionary,
 ) -> (pd.DataFrame, dict):
     working = df.copy()
     """Append Contest_Id and contest_type. Add contest_type column and fill it correctly.
@@ -698,8 +907,7 @@ def add_contest_id(
                 df_for_type[c_type],
                 f"{c_type}Contest",
                 "Name",
-                dictionary_df,
-                dictionary_path,
+                dictionary,
                 unmatched_id=none_or_unknown_id,
                 drop_all_ok=True,
             )
@@ -768,7 +976,9 @@ def add_selection_id(
         munger_name: str, for error reporting
         err: dict,
 
-    Adds new records to Selection and CandidateSelection db tables as needed.
+    Adds new records to Selection and CandidateSelection db tables as needed, committing them
+    in a short transaction of their own (so that concurrent loads wait for each other only
+    while selections are created).
 
     Returns:
         pd.DataFrame, copy of df with new Selection_Id column and without Candidate_Id column
@@ -793,44 +1003,52 @@ def add_selection_id(
             )
         selection_df = selection_df[selection_df.Candidate_Id != 0]
 
-        # pull any existing Ids into a new CandidateSelection_Id column,
-        #  replacing any nulls or blank strings with 0
-        col_map = {c: c for c in ["Party_Id", "Candidate_Id"]}
-        selection_df = db.append_id_to_dframe(
-            engine,
-            selection_df,
-            "CandidateSelection",
-            col_map=col_map,
-            null_ids_to_zero=True,
-        )
-
-        # find unmatched records
-        c_df_unmatched = selection_df[selection_df.CandidateSelection_Id == 0].copy()
-
-        if not c_df_unmatched.empty:
-            #  Load CandidateSelections to Selection table (for unmatched)
-            id_list = db.add_records_to_selection_table(engine, c_df_unmatched.shape[0])
-
-            # Load unmatched records into CandidateSelection table
-            c_df_unmatched["Id"] = pd.Series(id_list, index=c_df_unmatched.index)
-            new_err = db.insert_to_cdf_db(
+        # serialize with concurrent loads, so each candidate-party pair gets one selection
+        with db.selection_creation_transaction(engine) as connection:
+            # pull any existing Ids into a new CandidateSelection_Id column,
+            #  replacing any nulls or blank strings with 0
+            col_map = {c: c for c in ["Party_Id", "Candidate_Id"]}
+            selection_df = db.append_id_to_dframe(
                 engine,
-                c_df_unmatched,
+                selection_df,
                 "CandidateSelection",
-                "database",
-                f"{Path(__file__).absolute().parents[0].name}"
-                f".{inspect.currentframe().f_code.co_name}"
-                f" call to database.insert_to_cdf_db",
+                col_map=col_map,
+                null_ids_to_zero=True,
             )
-            if new_err:
-                err = ui.consolidate_errors([err, new_err])
-                if ui.fatal_error(new_err):
-                    return pd.DataFrame(), err
 
-            # update CandidateSelection_Id column for previously unmatched, merging on Candidate_Id and Party_Id
-            selection_df.loc[
-                c_df_unmatched.index, "CandidateSelection_Id"
-            ] = c_df_unmatched["Id"]
+            # find unmatched records
+            c_df_unmatched = selection_df[
+                selection_df.CandidateSelection_Id == 0
+            ].copy()
+
+            if not c_df_unmatched.empty:
+                #  Load CandidateSelections to Selection table (for unmatched)
+                id_list = db.add_records_to_selection_table(
+                    engine, c_df_unmatched.shape[0], connection=connection
+                )
+
+                # Load unmatched records into CandidateSelection table
+                c_df_unmatched["Id"] = pd.Series(id_list, index=c_df_unmatched.index)
+                new_err = db.insert_to_cdf_db(
+                    engine,
+                    c_df_unmatched,
+                    "CandidateSelection",
+                    "database",
+                    f"{Path(__file__).absolute().parents[0].name}"
+                    f".{inspect.currentframe().f_code.co_name}"
+                    f" call to database.insert_to_cdf_db",
+                    connection=connection,
+                )
+                if new_err:
+                    err = ui.consolidate_errors([err, new_err])
+                    if ui.fatal_error(new_err):
+                        connection.rollback()
+                        return pd.DataFrame(), err
+
+                # update CandidateSelection_Id column for previously unmatched, merging on Candidate_Id and Party_Id
+                selection_df.loc[
+                    c_df_unmatched.index, "CandidateSelection_Id"
+                ] = c_df_unmatched["Id"]
         # recast Candidate_Id and Party_Id to int in w['Candidate'];
         # Note that neither should have nulls, but rather the 'none or unknown' Id
         #  NB: c_df had this recasting done in the append_id_to_dframe routine
@@ -874,8 +1092,7 @@ def raw_to_id_simple(
     file_name: str,
     munger_name: str,
     juris_system_name,
-    dictionary_df: pd.DataFrame,
-    dictionary_path: str,
+    dictionary: CompiledDictionary,
 ) -> (pd.DataFrame, Optional[dict]):
     """Append ids to <df> for all elements given in <element_list>."""
     err = None
@@ -890,7 +1107,7 @@ def raw_to_id_simple(
                 drop = False
             if element == "CountItemType":
                 # munge raw to internal CountItemType
-                r_i = raw_to_internal_dictionary_df(dictionary_df, "CountItemType")
+                r_i = dictionary.frame("CountItemType")
                 recognized = r_i.CountItemType_raw.unique()
                 matched = working.CountItemType_raw.isin(recognized)
                 if not matched.all():
@@ -949,8 +1166,7 @@ def raw_to_id_simple(
                     element_df,
                     element,
                     name_field,
-                    dictionary_df,
-                    dictionary_path,
+                    dictionary,
                     drop_unmatched=drop,
                     unmatched_id=none_or_unknown_id,
                 )
@@ -1021,6 +1237,12 @@ def munge_raw_to_ids(
     alternate_dictionary: Optional[
         str
     ] = None,  # when given, use this dictionary, not the one in the jurisdiction directory
+    connection: Optional[
+        psycopg2.extensions.connection
+    ] = None,  # when given, use this connection for inserts
+    dictionary: Optional[
+        CompiledDictionary
+    ] = None,  # when given, use this already-compiled dictionary
 ) -> (pd.DataFrame, Optional[dict]):
     """Replace raw-munged columns with internal columns. For CountItemType
     this will be a text column; for others it will be an Id column"""
@@ -1029,12 +1251,13 @@ def munge_raw_to_ids(
     juris_system_name = Path(path_to_jurisdiction_dir).name
     working = df.copy()
 
-    # create dictionary dataframe
-    if alternate_dictionary:
-        dictionary_path = alternate_dictionary
-    else:
-        dictionary_path = os.path.join(path_to_jurisdiction_dir, "dictionary.txt")
-    dictionary_df = pd.read_csv(dictionary_path, sep="\t")
+    # get compiled dictionary
+    if dictionary is None:
+        if alternate_dictionary:
+            dictionary_path = alternate_dictionary
+        else:
+            dictionary_path = os.path.join(path_to_jurisdiction_dir, "dictionary.txt")
+        dictionary = compiled_dictionary(dictionary_path)
 
     # add Contest_Id column and contest_type column
     if "CandidateContest" in constant_dict.keys():
@@ -1074,8 +1297,7 @@ def munge_raw_to_ids(
                 munger_name,
                 err,
                 session,
-                dictionary_df,
-                dictionary_path,
+                dictionary,
             )
         except Exception as exc:
             err = ui.add_new_error(
@@ -1132,8 +1354,7 @@ def munge_raw_to_ids(
         munger_name,
         file_name,
         juris_system_name,
-        dictionary_df,
-        dictionary_path,
+        dictionary,
     )
     if new_err:
         err = ui.consolidate_errors([err, new_err])
@@ -1142,11 +1363,7 @@ def munge_raw_to_ids(
 
     # add Selection_Id (combines info from BallotMeasureSelection and CandidateContestSelection)
     try:
-        working, err = add_selection_id(
-            working,
-            session.bind,
-            err,
-        )
+        working, err = add_selection_id(working, session.bind, err)
         working, err_df = clean_ids(working, ["Selection_Id"])
     except Exception as exc:
         err = ui.add_new_error(
@@ -1165,6 +1382,8 @@ def munge_raw_to_ids(
         )
         return working, err
 
+    # only integer Ids and text (e.g., CountItemType) go on to the database
+    working = decategorize(working)
     return working, err
 
 
@@ -1299,24 +1518,11 @@ def munge_source_to_raw(
             return working, err
 
         try:
-            # compress whitespace for <element>_raw
-            compression = pd.DataFrame(
-                [
-                    [x, compress_whitespace(x)]
-                    for x in working[f"{element}_raw"].unique()
-                ],
-                columns=["uncompressed", "compressed"],
-            )
-
-            working = (
-                working.merge(
-                    compression,
-                    left_on=f"{element}_raw",
-                    right_on="uncompressed",
-                )
-                .drop([f"{element}_raw", "uncompressed"], axis=1)
-                .rename(columns={"compressed": f"{element}_raw"})
+            # compress whitespace for <element>_raw, once for each distinct value
+            working[f"{element}_raw"] = map_unique_values(
+                working[f"{element}_raw"], compress_whitespace_values
             )
+            working.reset_index(drop=True, inplace=True)
         except Exception as exc:
             err = ui.add_new_error(
                 err,
@@ -1391,11 +1597,42 @@ def get_lookup_tables(
     return lookup_table, err
 
 
+# checked munger parameters, keyed by (path, results_dir), along with
+#  (modification time, size) of munger file when checked
+_checked_munger_params: Dict[
+    Tuple[str, Optional[str]], Tuple[Tuple[int, int], dict, Optional[dict]]
+] = dict()
+
+
 def get_and_check_munger_params(
     munger_path: str, results_dir: Optional[str] = None
 ) -> (dict, Optional[dict]):
     """Checks that munger parameter file is internally consistent.
     If results_dir is included, then existence of any required
+    auxiliary files is checked as well.
+    Munger file is read and checked again only if it has changed since last checked"""
+    key = (os.path.abspath(munger_path), results_dir)
+    try:
+        stat = os.stat(key[0])
+    except OSError:
+        # let check_munger_params report the missing file
+        return check_munger_params(munger_path, results_dir=results_dir)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if (key not in _checked_munger_params.keys()) or (
+        _checked_munger_params[key][0] != signature
+    ):
+        params, err = check_munger_params(munger_path, results_dir=results_dir)
+        _checked_munger_params[key] = (signature, params, err)
+    # return copies, so that callers' changes don't affect cached values
+    _, params, err = _checked_munger_params[key]
+    return copy.deepcopy(params), copy.deepcopy(err)
+
+
+def check_munger_params(
+    munger_path: str, results_dir: Optional[str] = None
+) -> (dict, Optional[dict]):
+    """Reads munger parameter file and checks that it is internally consistent.
+    If results_dir is included, then existence of any required
     auxiliary files is checked as well"""
     raw_params, err = ui.get_parameters(
         required_keys=list(constants.req_munger_parameters.keys()),
@@ -2061,7 +2298,7 @@ def to_standard_count_frame(
             standard_list.append(working)
 
         # put all the good standard-form dataframes together into one
-        standard[sheet] = pd.concat(standard_list)
+        standard[sheet] = concat_keeping_categories(standard_list)
 
         # if even one df lacks a fatal error, consider all errors non-fatal for this sheet
         non_fatal_dfs = [
@@ -2085,7 +2322,7 @@ def to_standard_count_frame(
         fatal_sheets = [k for k in raw_dict.keys() if ui.fatal_error(error_by_sheet[k])]
         for sheet in fatal_sheets:
             error_by_sheet[sheet] = ui.fatal_err_to_non(error_by_sheet[sheet])
-        df = pd.concat([standard[k] for k in non_fatal_sheets])
+        df = concat_keeping_categories([standard[k] for k in non_fatal_sheets])
     else:
         df = pd.DataFrame()
     err = ui.consolidate_errors([error_by_sheet[k] for k in raw_dict.keys()])
@@ -2111,6 +2348,7 @@ def fill_vote_count(
     session,
     munger_name,
     err: Optional[dict],
+    connection: Optional[psycopg2.extensions.connection] = None,
 ) -> Optional[dict]:
 
     working = df.copy()
@@ -2136,7 +2374,12 @@ def fill_vote_count(
     # Fill VoteCount
     try:
         new_err = db.insert_to_cdf_db(
-            session.bind, working, "VoteCount", "munger", munger_name
+            session.bind,
+            working,
+            "VoteCount",
+            "munger",
+            munger_name,
+            connection=connection,
         )
         if new_err:
             err = ui.consolidate_errors([err, new_err])
@@ -2293,42 +2536,49 @@ def extract_blocks(
             munger_name,
             f"No data found in sheet {sheet_name} of file {file_name}",
         )
-        return list(), err
+        return list(), dict(), err
     else:
         err = None
     df_list = list()
-    working = df.copy()
     row_constants = dict()
     # NB: no info is in column headers because multi_block=yes sets header=None when data is read
 
-    # identify count rows (have at least one integer), blank rows, and text rows (all others)
-    mask_count = working.T.astype(str).apply(lambda row: row.str.isdigit().any())
-    mask_blank = working.T.apply(
-        lambda row: list(row.unique()) == [""]
-    )  # is this the best way?
-    count_rows = list(mask_count[mask_count].index)
-    text_rows = list(mask_count[(~mask_count) & (~mask_blank)].index)
-
-    # initialize check on max number of blocks
-    max_blocks_attained = False
-    blocks_created = 0
-
-    # loop through blocks starting at the top (blocks defined by text lines on top)
-    while text_rows and count_rows and not max_blocks_attained:
-        first_text_row = min(text_rows)
-        first_count_row = min(
-            [n for n in count_rows if n > first_text_row]
-        )  # TODO what if there is none?
-
-        # remove this block's rows from text and count lists
-        text_rows = [n for n in text_rows if n > first_count_row]
-        if text_rows:
-            block_end = min(text_rows)
+    # identify count rows (have at least one integer), blank rows, and text rows (all others),
+    #  one column at a time
+    is_count = np.zeros(df.shape[0], dtype=bool)
+    is_blank = np.ones(df.shape[0], dtype=bool)
+    for j in range(df.shape[1]):
+        column = df.iloc[:, j]
+        is_count |= column.astype(str).str.isdigit().to_numpy(dtype=bool)
+        is_blank &= (column == "").to_numpy(dtype=bool)
+    count_rows = np.flatnonzero(is_count)
+    text_rows = np.flatnonzero(~is_count & ~is_blank)
+
+    # find blocks starting at the top (blocks defined by text lines on top):
+    #  each block runs from a text row through the first count row below it,
+    #  and on up to (but not including) the next text row
+    next_text = 0  # position in text_rows of the first text row of the next block
+    while next_text < len(text_rows):
+        first_text_row = text_rows[next_text]
+        next_count = np.searchsorted(count_rows, first_text_row, side="right")
+        if next_count == len(count_rows):
+            if count_rows.size and not df_list:
+                err = ui.add_new_error(
+                    err,
+                    "munger",
+                    munger_name,
+                    f"No count rows found after first text row in sheet {sheet_name} of file {file_name}",
+                )
+            break
+        first_count_row = count_rows[next_count]
+        next_text = np.searchsorted(text_rows, first_count_row, side="right")
+        if next_text < len(text_rows):
+            block_end = text_rows[next_text]
         else:
-            block_end = working.shape[0]
-        count_rows = [n for n in count_rows if n > block_end]
+            block_end = df.shape[0]
 
-        block = working[first_text_row:block_end]
+        # slice block (without copying)
+        block = df.iloc[first_text_row:block_end]
 
         ## add block to list
         df_list.append(block)
@@ -2340,11 +2590,9 @@ def extract_blocks(
         if new_err:
             err = ui.consolidate_errors([err, new_err])
 
-        # if a maximum number of blocks was specified
-        if max_blocks:
-            blocks_created += 1
-            if blocks_created >= max_blocks:
-                max_blocks_attained = True
+        # stop if a maximum number of blocks was specified and has been reached
+        if max_blocks and len(df_list) >= max_blocks:
+            break
     return df_list, row_constants, err
 
 
@@ -2469,12 +2717,42 @@ def blank_out(df: pd.DataFrame, regex: str) -> pd.DataFrame:
     new = df.copy()
     for c in df.columns:
         try:
-            new[c] = df[c].str.replace(p, "")
+            if isinstance(df[c].dtype, pd.CategoricalDtype):
+                new[c] = map_unique_values(df[c], lambda x: x.str.replace(p, ""))
+            else:
+                new[c] = df[c].str.replace(p, "")
         except Exception:
             pass
     return new
 
 
+def concat_keeping_categories(df_list: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates dataframes as pd.concat does, except that any column that is categorical in every
+    dataframe remains categorical"""
+    if len(df_list) > 1:
+        categorical = [
+            c
+            for c in df_list[0].columns
+            if all(
+                (c in df.columns) and isinstance(df[c].dtype, pd.CategoricalDtype)
+                for df in df_list
+            )
+        ]
+        if categorical:
+            df_list = [df.copy() for df in df_list]
+            for c in categorical:
+                try:
+                    categories = union_categoricals(
+                        [df[c].array for df in df_list], ignore_order=True
+                    ).categories
+                except TypeError:
+                    # categories of different types, so leave to pd.concat
+                    continue
+                for df in df_list:
+                    df[c] = df[c].cat.set_categories(categories)
+    return pd.concat(df_list)
+
+
 def rename_column_index_by_number(
     df: pd.DataFrame,
     row: Optional[int],
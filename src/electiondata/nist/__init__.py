@@ -1,3 +1,4 @@
+import re
 import xml.etree.ElementTree as ET
 from typing import Optional, Dict, Any, List, Union, Pattern
 from urllib import request
@@ -46,14 +47,98 @@ def nist_v2_xml_export_tree(
     # include jurisdiction id in gp unit ids
     gpu_idxs = {jurisdiction_id}
 
-    # get vote count data (if rollup_subdivision_type is None, no rollup will happen)
-    results_df = db.read_vote_count_nist(
-        session, election_id, jurisdiction_id, rollup_ru_type=rollup_subdivision_type
-    )
+    # build contest elements from vote count data, a chunk at a time
+    #  (if rollup_subdivision_type is None, no rollup will happen),
+    #  collecting info on gp units, parties and candidates as we go
+    parties = dict()  # name of each party, by Id
+    candidates = dict()  # (Id, ballot name, party Id) of each candidate, in order found
+    contest_elts = list()
+    con_elt, cs_elt = None, None
+    contest_info, selection_id = None, None
+    candidate_ids, vote_counts = list(), set()
+
+    def finish_selection():
+        ET.SubElement(cs_elt, "CandidateIds").text = " ".join(
+            [f"oid{x}" for x in candidate_ids]
+        )
+
+    def finish_contest():
+        # create ElectionDistrictId sub-element
+        ET.SubElement(
+            con_elt, "ElectionDistrictId"
+        ).text = f'oid{contest_info["ElectionDistrict_Id"]}'
 
-    # collect ids for gp units that have vote counts, gp units that are election districts
-    gpu_idxs.update(results_df.ReportingUnit_Id.unique())
-    gpu_idxs.update(results_df.ElectionDistrict_Id.unique())
+        # create Name sub-element
+        ET.SubElement(con_elt, "Name").text = contest_info["ContestName"]
+
+        # create VotesAllowed sub-element
+        ET.SubElement(con_elt, "VotesAllowed").text = "1"
+        # TODO tech debt allow arbitrary "votes allowed
+
+    # NB: chunks are sorted by contest and selection
+    for results_df in db.read_vote_count_nist_chunks(
+        session, election_id, jurisdiction_id, rollup_ru_type=rollup_subdivision_type
+    ):
+        # collect ids for gp units that have vote counts, gp units that are election districts
+        gpu_idxs.update(results_df.ReportingUnit_Id.unique())
+        gpu_idxs.update(results_df.ElectionDistrict_Id.unique())
+        for vc in results_df.to_dict("records"):
+            parties.setdefault(vc["Party_Id"], vc["PartyName"])
+            candidates.setdefault(
+                (vc["Candidate_Id"], vc["BallotName"], vc["Party_Id"]), None
+            )
+            if contest_info is None or vc["Contest_Id"] != contest_info["Contest_Id"]:
+                if con_elt is not None:
+                    finish_selection()
+                    finish_contest()
+                # create element for the contest
+                contest_info = vc
+                attr = {
+                    "ObjectId": f'oid{vc["Contest_Id"]}',
+                    "xsi:type": f'{vc["ContestType"]}Contest',
+                }
+                con_elt = ET.Element("Contest", attr)
+                contest_elts.append(con_elt)
+                selection_id = None
+            # create ballot selection sub-elements
+            # TODO (remove assumption that it's a  CandidateContest)
+            if vc["Selection_Id"] != selection_id:
+                if selection_id is not None:
+                    finish_selection()
+                selection_id = vc["Selection_Id"]
+                attr = {
+                    "ObjectId": f"oid{selection_id}",
+                    "xsi:type": "CandidateSelection",
+                }
+                cs_elt = ET.SubElement(con_elt, "ContestSelection", attr)
+                candidate_ids, vote_counts = list(), set()
+            vote_count = (
+                vc["ReportingUnit_Id"],
+                vc["Candidate_Id"],
+                vc["CountItemType"],
+                vc["Count"],
+            )
+            if vote_count in vote_counts:
+                continue
+            vote_counts.add(vote_count)
+            if vc["Candidate_Id"] not in candidate_ids:
+                candidate_ids.append(vc["Candidate_Id"])
+            vote_counts_elt = ET.SubElement(cs_elt, "VoteCounts")
+            # create GpUnitId sub-element
+            ET.SubElement(
+                vote_counts_elt, "GpUnitId"
+            ).text = f'oid{vc["ReportingUnit_Id"]}'
+            # create Type sub-elements (for CountItemType)
+            if vc["CountItemType"] in constants.nist_standard["CountItemType"]:
+                ET.SubElement(vote_counts_elt, "Type").text = vc["CountItemType"]
+            else:
+                ET.SubElement(vote_counts_elt, "Type").text = "other"
+                ET.SubElement(vote_counts_elt, "OtherType").text = vc["CountItemType"]
+            # create Count sub-element
+            ET.SubElement(vote_counts_elt, "Count").text = str(vc["Count"])
+    if con_elt is not None:
+        finish_selection()
+        finish_contest()
 
     # ElectionReport (root)
     attr = {
@@ -109,17 +194,16 @@ def nist_v2_xml_export_tree(
     ET.SubElement(root, "IssuerAbbreviation").text = issuer_abbreviation
 
     # add each party
-    party_df = results_df[["Party_Id", "PartyName"]].drop_duplicates()
-    for i, p in party_df.iterrows():
+    for party_id, party_name in parties.items():
         p_elt = ET.SubElement(
             root,
             "Party",
             {
-                "ObjectId": f'oid{p["Party_Id"]}',
+                "ObjectId": f"oid{party_id}",
             },
         )
         p_name_elt = ET.SubElement(p_elt, "Name")
-        ET.SubElement(p_name_elt, "Text", {"Language": "en"}).text = p["PartyName"]
+        ET.SubElement(p_name_elt, "Text", {"Language": "en"}).text = party_name
 
     # still more sub-elements of ElectionReport
     ET.SubElement(root, "SequenceStart").text = "1"  # TODO placeholder
@@ -128,83 +212,15 @@ def nist_v2_xml_export_tree(
     ET.SubElement(root, "VendorApplicationId").text = vendor_application_id
 
     # add each candidate (as sub-element of Election)
-    candidate_df = results_df[
-        ["Candidate_Id", "BallotName", "Party_Id"]
-    ].drop_duplicates()
-    for i, can in candidate_df.iterrows():
-        can_elt = ET.SubElement(
-            e_elt, "Candidate", {"ObjectId": f'oid{can["Candidate_Id"]}'}
-        )
+    for candidate_id, ballot_name, party_id in candidates.keys():
+        can_elt = ET.SubElement(e_elt, "Candidate", {"ObjectId": f"oid{candidate_id}"})
         bn_elt = ET.SubElement(can_elt, "BallotName")
-        ET.SubElement(bn_elt, "Text", {"Language": "en"}).text = can["BallotName"]
+        ET.SubElement(bn_elt, "Text", {"Language": "en"}).text = ballot_name
         party_id_elt = ET.SubElement(can_elt, "PartyId")
-        party_id_elt.text = f'oid{can["Party_Id"]}'
+        party_id_elt.text = f"oid{party_id}"
 
     # add each contest (as sub-element of Election)
-    contest_df = results_df[
-        ["Contest_Id", "ContestName", "ContestType", "ElectionDistrict_Id"]
-    ].drop_duplicates()
-    for i, con in contest_df.iterrows():
-        # create element for the contest
-        attr = {
-            "ObjectId": f'oid{con["Contest_Id"]}',
-            "xsi:type": f'{con["ContestType"]}Contest',
-        }
-        con_elt = ET.SubElement(e_elt, "Contest", attr)
-
-        # create ballot selection sub-elements
-        # TODO (remove assumption that it's a  CandidateContest)
-        selection_idxs = results_df[results_df.Contest_Id == con["Contest_Id"]][
-            "Selection_Id"
-        ].unique()
-        for s_idx in selection_idxs:
-            attr = {
-                "ObjectId": f"oid{s_idx}",
-                "xsi:type": "CandidateSelection",
-            }
-            cs_elt = ET.SubElement(con_elt, "ContestSelection", attr)
-            vc_df = results_df[
-                (results_df.Contest_Id == con["Contest_Id"])
-                & (results_df.Selection_Id == s_idx)
-            ][
-                [
-                    "ReportingUnit_Id",
-                    "Candidate_Id",
-                    "CountItemType",
-                    "Count",
-                ]
-            ].drop_duplicates()
-            for idx, vc in vc_df.iterrows():
-                vote_counts_elt = ET.SubElement(cs_elt, "VoteCounts")
-                # create GpUnitId sub-element
-                ET.SubElement(
-                    vote_counts_elt, "GpUnitId"
-                ).text = f'oid{vc["ReportingUnit_Id"]}'
-                # create Type sub-elements (for CountItemType)
-                if vc["CountItemType"] in constants.nist_standard["CountItemType"]:
-                    ET.SubElement(vote_counts_elt, "Type").text = vc["CountItemType"]
-                else:
-                    ET.SubElement(vote_counts_elt, "Type").text = "other"
-                    ET.SubElement(vote_counts_elt, "OtherType").text = vc[
-                        "CountItemType"
-                    ]
-                # create Count sub-element
-                ET.SubElement(vote_counts_elt, "Count").text = str(vc["Count"])
-
-            candidate_ids = " ".join([f"oid{x}" for x in vc_df.Candidate_Id.unique()])
-            ET.SubElement(cs_elt, "CandidateIds").text = candidate_ids
-
-        # create ElectionDistrictId sub-element
-        ET.SubElement(
-            con_elt, "ElectionDistrictId"
-        ).text = f'oid{con["ElectionDistrict_Id"]}'
-
-        # create Name sub-element
-        ET.SubElement(con_elt, "Name").text = con["ContestName"]
-
-        # create VotesAllowed sub-element
-        ET.SubElement(con_elt, "VotesAllowed").text = "1"
-        # TODO tech debt allow arbitrary "votes allowed
+    e_elt.extend(contest_elts)
 
     # election scope (geographic unit for whole election)
     ET.SubElement(e_elt, "ElectionScopeId").text = f"oid{jurisdiction_id}"
@@ -359,6 +375,109 @@ def df_from_tree(
     return df, err
 
 
+def df_from_xml_file(
+    f_path: str,
+    main_path: str,
+    main_attrib: Optional[str],
+    xml_path_info: Dict[str, Dict[str, Dict[str, str]]],
+    file_name: str,
+    ns: Optional[str],
+    lookup_id: str = None,
+    rows_per_chunk: int = constants.xml_rows_per_chunk,
+) -> (pd.DataFrame, Optional[dict]):
+    """Same as df_from_tree, but streams the xml file at <f_path> rather than
+    holding the whole tree in memory. Each row is completed as soon as all elements
+    holding its munge-field info have been parsed; elements are discarded once no
+    longer needed."""
+    if ns:
+        ns = f"{{{ns}}}"
+    else:
+        ns = ""
+    with_ns = [f"{ns}{s}" for s in main_path.split("/")]
+    head = with_ns[0]
+    # tags of elements carrying info for munge fields
+    field_tags = {info["local_root_tag"] for info in xml_path_info.values()}
+    # tags of elements that may be reached via find() from an ancestor, so must be kept
+    #  until that ancestor is complete
+    # NB: tags may carry a namespace uri (e.g. {http://...}Name), which may itself contain "/"
+    found_tags = {
+        t
+        for info in xml_path_info.values()
+        if not info["attrib"]
+        for t in re.split(r"/(?![^{]*})", info["tail"])
+    }
+
+    stack = list()  # open elements, from root down
+    # pending[d]: rows awaiting info from the (open) element at depth d or its ancestors
+    pending = list()
+    chunk = list()  # completed rows not yet in a dataframe
+    df_list = list()
+    err = None
+    for event, element in ET.iterparse(f_path, events=("start", "end")):
+        if event == "start":
+            if not stack and element.tag != head:
+                err = ui.add_new_error(
+                    None,
+                    "file",
+                    file_name,
+                    f"Root element of file is not {head}, as expected per munger",
+                )
+                return pd.DataFrame(), err
+            stack.append(element)
+            pending.append(list())
+            continue
+
+        # event == "end"
+        rows = pending.pop()
+        # element is a driver if its path from the root matches the munger's path
+        if len(stack) == len(with_ns) and all(
+            stack[j].tag == with_ns[j] for j in range(len(with_ns))
+        ):
+            if lookup_id:
+                if main_attrib:
+                    row = {lookup_id: element.attrib[main_attrib]}
+                else:
+                    row = {lookup_id: element.text}
+            else:
+                if main_attrib:
+                    row = {"Count": int(element.attrib[main_attrib])}
+                else:
+                    row = {"Count": int(element.text)}
+            rows.append(row)
+        # fill munge-field info from this element, now that it is complete
+        #  (NB: elements close from the bottom up, so info from higher elements overwrites,
+        #  as in df_from_tree)
+        if rows and element.tag in field_tags:
+            for field, info in xml_path_info.items():
+                if info["local_root_tag"] == element.tag:
+                    if info["attrib"]:
+                        try:
+                            value = element.attrib[info["attrib"]]
+                        except KeyError:
+                            continue
+                    else:
+                        value = element.find(info["tail"]).text
+                    for row in rows:
+                        row[field] = value
+        stack.pop()
+        # rows are complete if no open ancestor carries field info
+        if rows:
+            if any(ancestor.tag in field_tags for ancestor in stack):
+                pending[-1].extend(rows)
+            else:
+                chunk.extend(rows)
+                if len(chunk) >= rows_per_chunk:
+                    df_list.append(pd.DataFrame(chunk))
+                    chunk = list()
+        # discard element unless an ancestor may need to find it
+        if stack and element.tag not in found_tags:
+            stack[-1].remove(element)
+    if chunk or not df_list:
+        df_list.append(pd.DataFrame(chunk))
+    df = pd.concat(df_list, ignore_index=True)
+    return df, err
+
+
 def check_nist_namespace(f_path, key) -> Optional[dict]:
     """get the namespaces in the XML and return error if the one we're expecting
     is not found"""
@@ -1,3 +1,4 @@
+import concurrent.futures
 from configparser import (
     ConfigParser,
     MissingSectionHeaderError,
@@ -5,9 +6,12 @@ from configparser import (
     ParsingError,
 )
 from csv import QUOTE_MINIMAL
+import hashlib
 from inspect import currentframe
+import io
 import json
-from numpy import where
+import multiprocessing
+from numpy import where, nan
 from os import walk, listdir
 import os.path
 import pandas as pd
@@ -15,7 +19,7 @@ from pathlib import Path
 import shutil
 from slugify import slugify
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import xlrd
 import xml.etree.ElementTree
 
@@ -58,6 +62,75 @@ def json_kwargs(
     return j_kwargs, json_rename
 
 
+def pull_json_field(obj: Any, keys: List[str]) -> Any:
+    """Returns value found by following <keys> down from <obj>, or nan if path is missing"""
+    for k in keys:
+        try:
+            obj = obj[k]
+        except (KeyError, TypeError, IndexError):
+            return nan
+    return obj
+
+
+def df_from_json_file(
+    f_path: str,
+    munge_fields: List[str],
+    driving_path: str,
+    driver_new_col_name: str,
+) -> pd.DataFrame:
+    """Reads nested json file into dataframe with one row per item found at the end of
+    <driving_path>, and only the columns needed for munging: the count column
+    (renamed to <driver_new_col_name>) and one column for each munge field.
+    Same rows and columns (for those fields) as pd.json_normalize with json_kwargs,
+    but objects are pruned to the keys on the munge and count paths while the file
+    is parsed, and the full normalized frame is never built."""
+    j_kwargs, rename = json_kwargs(munge_fields, driving_path, driver_new_col_name)
+    record_path = j_kwargs["record_path"]
+    meta = j_kwargs["meta"]
+
+    # keep only keys on some path we need, dropping other subtrees as soon as they are parsed
+    needed_keys = set(record_path).union(rename.keys())
+    for m_path in meta:
+        needed_keys.update(m_path)
+
+    def prune(pairs):
+        return {k: v for k, v in pairs if k in needed_keys}
+
+    with open(f_path, "r") as f:
+        data = json.load(f, object_pairs_hook=prune)
+
+    # for each meta field, depth of object from which it is pulled (as in json_normalize)
+    depth = len(record_path) - 1
+    meta_info = [
+        (".".join(m_path), min(len(m_path) - 1, depth), m_path) for m_path in meta
+    ]
+    columns = {c: list() for c in rename.values()}
+    columns.update({c: list() for c, _, _ in meta_info})
+
+    def walk_records(objs: Any, level: int, seen: Dict[str, Any]):
+        if isinstance(objs, dict):
+            objs = [objs]
+        elif not isinstance(objs, list):
+            return
+        for obj in objs:
+            values = seen.copy()
+            for col, d, m_path in meta_info:
+                if d == level:
+                    values[col] = pull_json_field(obj, m_path[d:])
+            children = pull_json_field(obj, [record_path[level]])
+            if level < depth:
+                walk_records(children, level + 1, values)
+            elif isinstance(children, list):
+                for record in children:
+                    for old, new in rename.items():
+                        columns[new].append(pull_json_field(record, [old]))
+                    for col, _, _ in meta_info:
+                        columns[col].append(values[col])
+
+    walk_records(data, 0, dict())
+    return pd.DataFrame(columns)
+
+
 def tabular_kwargs(
     p: Dict[str, Any], kwargs: Dict[str, Any], aux=False
 ) -> Dict[str, Any]:
@@ -111,6 +184,10 @@ def basic_kwargs(p: Dict[str, Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
     return kwargs
 
 
+# compression of flat text files, by file extension (as pandas infers it when reading from a path)
+compression_by_extension = {".gz": "gzip", ".bz2": "bz2", ".zip": "zip", ".xz": "xz"}
+
+
 def get_row_constant_kwargs(kwargs: dict, rows_to_read: List[int]) -> dict:
     rck = kwargs.copy()
     rck["header"] = None
@@ -118,7 +195,10 @@ def get_row_constant_kwargs(kwargs: dict, rows_to_read: List[int]) -> dict:
     return rck
 
 
-def list_desired_excel_sheets(f_path: str, p: dict) -> (Optional[list], Optional[dict]):
+def list_desired_excel_sheets(
+    f_path: str, p: dict, xl: Optional[pd.ExcelFile] = None
+) -> (Optional[list], Optional[dict]):
+    """If <xl> is given, it is the already-opened workbook at <f_path>"""
     err = None
     file_name = Path(f_path).name
     if p["sheets_to_read_names"]:
@@ -127,7 +207,8 @@ def list_desired_excel_sheets(f_path: str, p: dict) -> (Optional[list], Optional
         try:
             # read an xlsx file
             # # nb: the following fails on VT 2020 files
-            xl = pd.ExcelFile(f_path)
+            if xl is None:
+                xl = pd.ExcelFile(f_path)
             all_sheets = xl.sheet_names
             # xlsx = openpyxl.load_workbook(f_path)
             # all_sheets = xlsx.get_sheet_names()
@@ -170,7 +251,6 @@ def read_single_datafile(
     kwargs = dict()  # for syntax checker
     df_dict = dict()  # for syntax checker
     row_constants = dict()  # for syntax checker
-    rename = dict()  # for syntax checker
     file_name = Path(f_path).name
     munger_name = Path(munger_path).stem
 
@@ -190,8 +270,6 @@ def read_single_datafile(
             kwargs["sep"] = "\t"
         else:
             kwargs["sep"] = p["flat_text_delimiter"]
-    elif p["file_type"] in ["json-nested"]:
-        kwargs, rename = json_kwargs(p["munge_fields"], p["count_location"], "Count")
     # read file
     try:
         if p["file_type"] in ["xml"]:
@@ -201,9 +279,8 @@ def read_single_datafile(
             else:
                 driver = nist.xml_count_parse_info(p, ignore_namespace=True)
             xml_path_info = nist.xml_string_path_info(p["munge_fields"], p["namespace"])
-            tree = xml.etree.ElementTree.parse(f_path)
-            df, err = nist.df_from_tree(
-                tree,
+            df, err = nist.df_from_xml_file(
+                f_path,
                 xml_path_info=xml_path_info,
                 file_name=file_name,
                 **driver,
@@ -214,31 +291,61 @@ def read_single_datafile(
                 df_dict = {"Sheet1": df}
         elif p["file_type"] in ["json-nested"]:
             # TODO what if json-nested is a lookup?
-            with open(f_path, "r") as f:
-                data = json.loads(f.read())
-            df = pd.json_normalize(data, **kwargs)
+            df = df_from_json_file(
+                f_path, p["munge_fields"], p["count_location"], "Count"
+            )
             if not fatal_error(err):
-                df.rename(columns=rename, inplace=True)
                 df_dict = {"Sheet1": df}
 
         elif p["file_type"] == "excel":
-            desired_sheets, new_err = list_desired_excel_sheets(f_path, p)
-            if new_err:
-                err = consolidate_errors([err, new_err])
-                if fatal_error(new_err):
-                    df_dict = dict()
-                    return df_dict, row_constants, err
-            df_dict, row_constants, new_err = excel_to_dict(
-                f_path,
-                kwargs,
-                desired_sheets,
-                p["rows_with_constants"],
-            )
+            # open workbook just once, for listing sheets and for reading data and row constants
+            #  from all sheets
+            try:
+                xl = pd.ExcelFile(f_path)
+            except FileNotFoundError:
+                raise
+            except Exception:
+                # # nb: fails on VT 2020 files
+                xl = None
+            try:
+                desired_sheets, new_err = list_desired_excel_sheets(f_path, p, xl=xl)
+                if new_err:
+                    err = consolidate_errors([err, new_err])
+                    if fatal_error(new_err):
+                        df_dict = dict()
+                        return df_dict, row_constants, err
+                if (xl is not None) and (
+                    len(desired_sheets) >= constants.min_sheets_for_parallel_read
+                ):
+                    df_dict, row_constants, new_err = excel_to_dict_in_parallel(
+                        f_path,
+                        kwargs,
+                        desired_sheets,
+                        p["rows_with_constants"],
+                    )
+                else:
+                    df_dict, row_constants, new_err = excel_to_dict(
+                        f_path,
+                        kwargs,
+                        desired_sheets,
+                        p["rows_with_constants"],
+                        xl=xl,
+                    )
+            finally:
+                if xl is not None:
+                    xl.close()
             if fatal_error(new_err):
                 df_dict = dict()
         elif p["file_type"] == "flat_text":
+            # read file from disk just once, for data and for any row constants
+            with open(f_path, "rb") as f:
+                buffer = io.BytesIO(f.read())
+            suffix = Path(f_path).suffix.lower()
+            if suffix in compression_by_extension.keys():
+                kwargs["compression"] = compression_by_extension[suffix]
+            padded = False
             try:
-                df = pd.read_csv(f_path, **kwargs)
+                df = pd.read_csv(buffer, **kwargs)
             except ValueError as ve:
                 print(
                     f"ValueError (while reading flat text file), possibly from uneven record lengths: {ve}\n "
@@ -249,7 +356,9 @@ def read_single_datafile(
                 kwargs_pad = kwargs
                 kwargs_pad["index_col"] = None
                 kwargs_pad["header"] = None
-                df = pd.read_csv(f_path, **kwargs_pad).fillna("")
+                buffer.seek(0)
+                df = pd.read_csv(buffer, **kwargs_pad).fillna("")
+                padded = True
                 # set headers per munger
                 header_int_or_list = tabular_kwargs(p, dict())["header"]
                 if isinstance(
@@ -274,10 +383,15 @@ def read_single_datafile(
             df_dict = {"Sheet1": df}
             # get the row constants
             if p["rows_with_constants"]:
-                row_constant_kwargs = get_row_constant_kwargs(
-                    kwargs, p["rows_with_constants"]
-                )
-                row_df = pd.read_csv(f_path, **row_constant_kwargs)
+                if (kwargs["header"] is None) and not padded:
+                    # data was read without header, so constant rows are at the top of the data
+                    row_df = df.head(max(p["rows_with_constants"]) + 1)
+                else:
+                    row_constant_kwargs = get_row_constant_kwargs(
+                        kwargs, p["rows_with_constants"]
+                    )
+                    buffer.seek(0)
+                    row_df = pd.read_csv(buffer, **row_constant_kwargs)
                 row_constants["Sheet1"], new_err = build_row_constants_from_df(
                     row_df, p["rows_with_constants"], file_name, "Sheet1"
                 )
@@ -342,9 +456,15 @@ def excel_to_dict(
     kwargs: Dict[str, Any],
     sheet_list: Optional[List[str]],
     rows_to_read: List[int],
+    xl: Optional[pd.ExcelFile] = None,
 ) -> (Dict[str, pd.DataFrame], Dict[str, Dict[str, Any]], Optional[dict]):
     """Returns dictionary of dataframes (one for each sheet), dictionary of dictionaries of constant values
-    (one dictionary for each sheet) and error."""
+    (one dictionary for each sheet) and error. If <xl> is given, it is the already-opened workbook at <f_path>,
+    and sheets are read from it rather than from the file."""
+    if xl is None:
+        source = f_path
+    else:
+        source = xl
     kwargs["index_col"] = None
     #  need to omit index_col here since multi-index headers are possible
     # to avoid getting fatal error when a sheet doesn't read in correctly
@@ -368,7 +488,7 @@ def excel_to_dict(
         )
     for sheet in sheet_list:
         try:
-            df_dict[sheet] = pd.read_excel(f_path, **kwargs, sheet_name=sheet)
+            df_dict[sheet] = pd.read_excel(source, **kwargs, sheet_name=sheet)
             # ignore any empty sheet
             if df_dict[sheet].empty:
                 df_dict.pop(sheet)
@@ -386,9 +506,13 @@ def excel_to_dict(
 
         try:
             if rows_to_read:
-                row_constant_df = pd.read_excel(
-                    f_path, **row_constant_kwargs, sheet_name=sheet
-                )
+                if (kwargs["header"] is None) and (sheet in df_dict.keys()):
+                    # data was read without header, so constant rows are at the top of the data
+                    row_constant_df = df_dict[sheet].head(max(rows_to_read) + 1)
+                else:
+                    row_constant_df = pd.read_excel(
+                        source, **row_constant_kwargs, sheet_name=sheet
+                    )
                 row_constants[sheet], new_err = build_row_constants_from_df(
                     row_constant_df, rows_to_read, file_name, sheet
                 )
@@ -407,6 +531,73 @@ def excel_to_dict(
     return df_dict, row_constants, err
 
 
+def excel_sheets_to_dict(
+    f_path: str,
+    kwargs: Dict[str, Any],
+    sheet_list: List[str],
+    rows_to_read: List[int],
+) -> (Dict[str, pd.DataFrame], Dict[str, Dict[str, Any]], Optional[dict]):
+    """Opens workbook at <f_path> once and reads the sheets in <sheet_list> as excel_to_dict does.
+    (Run in worker processes by excel_to_dict_in_parallel)"""
+    with pd.ExcelFile(f_path) as xl:
+        return excel_to_dict(f_path, kwargs, sheet_list, rows_to_read, xl=xl)
+
+
+def excel_to_dict_in_parallel(
+    f_path: str,
+    kwargs: Dict[str, Any],
+    sheet_list: List[str],
+    rows_to_read: List[int],
+    processes: int = constants.excel_sheet_processes,
+) -> (Dict[str, pd.DataFrame], Dict[str, Dict[str, Any]], Optional[dict]):
+    """Same as excel_to_dict, but with sheets divided among <processes> worker processes,
+    each of which opens the workbook once. Dataframes, row constants and errors
+    are returned in the order of <sheet_list>, regardless of which process finishes first.
+    If worker processes cannot be used, reads sheets in this process."""
+    processes = min(processes, len(sheet_list))
+    if processes < 2:
+        with pd.ExcelFile(f_path) as xl:
+            return excel_to_dict(f_path, kwargs, sheet_list, rows_to_read, xl=xl)
+    # contiguous runs of sheets, so that consolidated errors are in order of <sheet_list>
+    run_length = -(-len(sheet_list) // processes)
+    sheet_lists = [
+        sheet_list[j : j + run_length] for j in range(0, len(sheet_list), run_length)
+    ]
+    try:
+        # NB: spawn rather than fork, since the calling process may have other threads
+        #  (e.g., one inserting into the db) holding db connections or locks
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=len(sheet_lists),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    excel_sheets_to_dict, f_path, kwargs.copy(), sl, rows_to_read
+                )
+                for sl in sheet_lists
+            ]
+            results = [f.result() for f in futures]
+    except (OSError, concurrent.futures.process.BrokenProcessPool) as exc:
+        print(
+            f"Unable to read sheets of {f_path} in parallel ({exc}), "
+            f"so reading them one by one"
+        )
+        with pd.ExcelFile(f_path) as xl:
+            return excel_to_dict(f_path, kwargs, sheet_list, rows_to_read, xl=xl)
+
+    # assemble results in order of sheet_list
+    df_dict = dict()
+    row_constants = dict()
+    for sheet in sheet_list:
+        for (sl_df_dict, sl_row_constants, _) in results:
+            if sheet in sl_df_dict.keys():
+                df_dict[sheet] = sl_df_dict[sheet]
+            if sheet in sl_row_constants.keys():
+                row_constants[sheet] = sl_row_constants[sheet]
+    err = consolidate_errors([sl_err for (_, _, sl_err) in results])
+    return df_dict, row_constants, err
+
+
 def build_row_constants_from_df(
     df: pd.DataFrame, rows_to_read: List[int], file_name: str, sheet: str
 ) -> (Dict[int, Any], Optional[dict]):
@@ -417,8 +608,9 @@ def build_row_constants_from_df(
     err = None
     for row in rows_to_read:
         try:
-            first_valid_idx = working.loc[row].fillna("").first_valid_index()
-            row_constants[row] = working.fillna("").loc[row, first_valid_idx]
+            row_values = working.loc[row].fillna("")
+            first_valid_idx = row_values.first_valid_index()
+            row_constants[row] = row_values[first_valid_idx]
         except KeyError as ke:
             err = add_new_error(
                 err,
@@ -438,6 +630,31 @@ def build_row_constants_from_df(
     return row_constants, err
 
 
+def file_content_hash(paths: List[str]) -> str:
+    """Returns hex sha256 digest of the contents of the files at <paths> (in order).
+    Raises OSError if any file cannot be read"""
+    combined = hashlib.sha256()
+    for path in paths:
+        # hash each file separately, so that bytes moved from one file to the next change the digest
+        single = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(constants.hash_block_size), b""):
+                single.update(block)
+        combined.update(single.digest())
+    return combined.hexdigest()
+
+
+def results_content_hash(
+    results_file_path: str, munger_paths: List[str], dictionary_path: str
+) -> Optional[str]:
+    """Returns hash of the contents of all inputs to loading a results file: the results file,
+    its munger files and the jurisdiction's dictionary. Returns None if any of them cannot be read"""
+    try:
+        return file_content_hash([results_file_path] + munger_paths + [dictionary_path])
+    except OSError:
+        return None
+
+
 def copy_directory_with_backup(
     original_path: str,
     copy_path: str,
@@ -509,6 +726,32 @@ def copy_with_err_handling(
     return err
 
 
+# parsed parameter files, keyed by path, along with (modification time, size) of file when parsed
+_parsed_param_files: Dict[str, Tuple[Tuple[int, int], ConfigParser]] = dict()
+
+
+def read_param_file(param_file: str) -> Optional[ConfigParser]:
+    """Returns parser holding the contents of <param_file>, or None if file not found.
+    File is parsed again only if it has changed since it was last parsed.
+    Parser is shared by all callers, so must not be modified.
+    Raises any exception from parsing"""
+    key = os.path.abspath(param_file)
+    try:
+        stat = os.stat(key)
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if key in _parsed_param_files.keys():
+        parsed_signature, parser = _parsed_param_files[key]
+        if parsed_signature == signature:
+            return parser
+    parser = ConfigParser()
+    if len(parser.read(key)) == 0:
+        return None
+    _parsed_param_files[key] = (signature, parser)
+    return parser
+
+
 def get_parameters(
     required_keys: List[str],
     param_file: str,
@@ -522,11 +765,10 @@ def get_parameters(
     err = None
 
     # read info from file
-    parser = ConfigParser()
     # find header
     try:
-        p = parser.read(param_file)
-        if len(p) == 0:
+        parser = read_param_file(param_file)
+        if parser is None:
             err = add_new_error(err, "file", param_file, "File not found")
             return d, err
 
@@ -587,10 +829,8 @@ def get_parameters(
 def get_section_headers(param_file: str) -> (List[str], Optional[dict]):
     err = None
     # read info from file
-    parser = ConfigParser()
-    # find header
-    p = parser.read(param_file)
-    if len(p) == 0:
+    parser = read_param_file(param_file)
+    if parser is None:
         err = add_new_error(err, "file", param_file, "File not found")
         return list(), err
     headers = parser.sections()
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from electiondata import database as db, userinterface as ui
+
+
+def test_insert_to_cdf_db_skips_existing(dataloader):
+    engine = dataloader.session.bind
+    df = pd.DataFrame(
+        {
+            "Name": ["Test Party A", "Test Party B", "Test Party A"],
+            "Abbreviation": ["TPA", "TPB", "TPA"],
+        }
+    )
+    for _ in range(2):
+        err = db.insert_to_cdf_db(engine, df, "Party", "database", "test")
+        assert not ui.fatal_error(err), err
+    with db.pooled_cursor(engine) as cursor:
+        cursor.execute(
+            """SELECT "Name", count(*) FROM "Party" WHERE "Name" = ANY(%s)
+            GROUP BY "Name" ORDER BY "Name" """,
+            [["Test Party A", "Test Party B"]],
+        )
+        assert cursor.fetchall() == [("Test Party A", 1), ("Test Party B", 1)]
+    # new records are found by name lookups made after the insertion
+    assert db.name_to_id(dataloader.session, "Party", "Test Party B")
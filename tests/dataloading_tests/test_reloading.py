@@ -0,0 +1,99 @@
+import electiondata as ed
+from electiondata import database as db
+
+
+def load_one_pair(dataloader, test_data_url) -> (str, str, int, int):
+    """Loads testing data; returns election, jurisdiction and their Ids
+    for some pair with results successfully loaded"""
+    dataloader.get_testing_data_from_git_repo(test_data_url)
+    successfully_loaded, _, _, _ = dataloader.load_all(move_files=False)
+    pairs = [ej for ej, files in successfully_loaded.items() if files]
+    assert pairs, "No results loaded from testing data"
+    election, jurisdiction = pairs[0].split(";")
+    election_id = db.name_to_id(dataloader.session, "Election", election)
+    juris_id = db.name_to_id(dataloader.session, "ReportingUnit", jurisdiction)
+    return election, jurisdiction, election_id, juris_id
+
+
+def pair_counts(dataloader, election_id: int, juris_id: int) -> (int, int):
+    """Returns number and sum of VoteCounts for the election-jurisdiction pair"""
+    with db.pooled_cursor(dataloader.session) as cursor:
+        cursor.execute(
+            """SELECT count(*), sum(vc."Count") FROM "VoteCount" vc
+            JOIN _datafile d ON vc."_datafile_Id" = d."Id"
+            WHERE d."Election_Id" = %s AND d."ReportingUnit_Id" = %s""",
+            [election_id, juris_id],
+        )
+        return cursor.fetchone()
+
+
+def test_ej_pair_unchanged(dataloader, test_data_url):
+    election, jurisdiction, election_id, juris_id = load_one_pair(
+        dataloader, test_data_url
+    )
+    assert ed.ej_pair_unchanged(dataloader, election, jurisdiction)
+
+    # a recorded hash that no longer matches the files means the pair has changed
+    connection = dataloader.session.bind.raw_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        """UPDATE _datafile SET content_hash = 'stale'
+        WHERE "Election_Id" = %s AND "ReportingUnit_Id" = %s""",
+        [election_id, juris_id],
+    )
+    connection.commit()
+    cursor.close()
+    connection.close()
+    assert not ed.ej_pair_unchanged(dataloader, election, jurisdiction)
+
+
+def test_swap_in_staged_results(dataloader, test_data_url):
+    _, _, election_id, juris_id = load_one_pair(dataloader, test_data_url)
+    n, total = pair_counts(dataloader, election_id, juris_id)
+    assert n > 0
+
+    # stage a copy of the pair's results, with every count doubled
+    schema = "staging_test"
+    engine = dataloader.session.bind
+    assert db.create_staging_schema(engine, schema) is None
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        f"""INSERT INTO {schema}._datafile SELECT * FROM _datafile
+        WHERE "Election_Id" = %s AND "ReportingUnit_Id" = %s;
+        INSERT INTO {schema}."VoteCount" SELECT * FROM "VoteCount"
+        WHERE "_datafile_Id" IN (SELECT "Id" FROM {schema}._datafile);
+        UPDATE {schema}."VoteCount" SET "Count" = 2 * "Count";""",
+        [election_id, juris_id],
+    )
+    connection.commit()
+
+    assert db.swap_in_staged_results(engine, schema, election_id, juris_id) is None
+    assert pair_counts(dataloader, election_id, juris_id) == (n, 2 * total)
+    cursor.execute(
+        "SELECT count(*) FROM information_schema.schemata WHERE schema_name = %s",
+        [schema],
+    )
+    assert cursor.fetchone()[0] == 0
+    cursor.close()
+    connection.close()
+
+
+def test_rollup_matches_vote_counts(dataloader, test_data_url):
+    _, _, election_id, juris_id = load_one_pair(dataloader, test_data_url)
+    with db.pooled_cursor(dataloader.session) as cursor:
+        # every count is nested in the jurisdiction, so each datafile's rolled-up total
+        #  for the jurisdiction is the sum of all its counts
+        cursor.execute(
+            """SELECT d."Id",
+                (SELECT sum("Count") FROM "VoteCount" WHERE "_datafile_Id" = d."Id"),
+                (SELECT sum("Count") FROM "_rollup"
+                    WHERE "_datafile_Id" = d."Id" AND "ReportingUnit_Id" = %s)
+            FROM _datafile d
+            WHERE d."Election_Id" = %s AND d."ReportingUnit_Id" = %s""",
+            [juris_id, election_id, juris_id],
+        )
+        totals = cursor.fetchall()
+    assert totals
+    for datafile_id, vote_count_total, rollup_total in totals:
+        assert vote_count_total == rollup_total, f"Rollup wrong for datafile {datafile_id}"
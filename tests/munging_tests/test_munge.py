@@ -0,0 +1,109 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from electiondata import munge as m, userinterface as ui, constants
+
+tests_dir = Path(__file__).parents[1]
+data_dir = os.path.join(tests_dir, "000_data_for_pytest")
+mungers_dir = os.path.join(Path(__file__).parents[2], "src", "mungers")
+
+
+def munge_file(munger_name: str, f_path: str) -> (pd.DataFrame, dict):
+    munger_path = os.path.join(mungers_dir, f"{munger_name}.munger")
+    p, err = m.get_and_check_munger_params(munger_path)
+    assert not ui.fatal_error(err), f"Munger {munger_name} not read: {err}"
+    return m.file_to_raw_df(munger_path, p, f_path, str(Path(f_path).parent))
+
+
+def test_regex_column_with_blanks():
+    pattern = r"^(.*) County$"
+    df = pd.DataFrame(
+        {"County": ["Adams County", None, "Bell County", "Bell County", "Cass"]}
+    )
+    for working in [df, df.astype("category")]:
+        new, err = m.add_regex_column(working, "County", "ReportingUnit", pattern, "t")
+        assert not ui.fatal_error(err), err
+        values = list(m.decategorize(new)["ReportingUnit"])
+        assert values[0] == "Adams"
+        assert pd.isnull(values[1])
+        assert values[2:4] == ["Bell", "Bell"]
+        assert values[4] == f"Cass{constants.regex_failure_string} {pattern}"
+
+
+def test_gu_gen_munge():
+    f_path = os.path.join(
+        data_dir, "2020-General", "Guam", "2020-General-Offical-Guam_rev_SFS.xlsx"
+    )
+    df, err = munge_file("gu_gen", f_path)
+    assert not ui.fatal_error(err), err
+    assert not df.empty
+    for c in ["Candidate_raw", "Party_raw", "ReportingUnit_raw", "CandidateContest_raw"]:
+        assert df[c].notnull().all(), f"Null values in {c}"
+        assert not df[c].astype(str).str.contains(constants.regex_failure_string).any()
+
+
+def test_map_unique_values_with_nulls():
+    s = pd.Series(["a", None, "b", "a", None], name="x")
+    for working in [s, s.astype("category")]:
+        new = m.map_unique_values(working, lambda t: t.str.upper())
+        assert isinstance(new.dtype, pd.CategoricalDtype) == isinstance(
+            working.dtype, pd.CategoricalDtype
+        )
+        assert new.name == "x"
+        assert list(new.index) == list(working.index)
+        values = list(m.decategorize(new.to_frame())["x"])
+        assert values[0] == values[3] == "A"
+        assert values[2] == "B"
+        assert pd.isnull(values[1]) and pd.isnull(values[4])
+
+
+def test_fill_nulls_and_decategorize():
+    s = pd.Series(["a", None, "b"], dtype="category", name="x")
+    filled = m.fill_nulls(s, "")
+    assert isinstance(filled.dtype, pd.CategoricalDtype)
+    assert list(filled.astype("object")) == ["a", "", "b"]
+    df = m.decategorize(pd.DataFrame({"x": s, "y": [1, 2, 3]}))
+    assert df["x"].dtype == "object"
+    assert df["y"].dtype == "int64"
+    assert pd.isnull(df["x"][1])
+
+
+def test_distinct_row_codes_with_nulls():
+    df = pd.DataFrame(
+        {"a": ["x", None, "x", None, "y"], "b": [1.0, None, 1.0, None, None]}
+    )
+    for working in [df, df.astype({"a": "category"})]:
+        codes, first_positions = m.distinct_row_codes(working)
+        assert list(codes) == [0, 1, 0, 1, 2]
+        assert list(first_positions) == [0, 1, 4]
+
+
+def test_extract_blocks():
+    df = pd.DataFrame(
+        [
+            ["Contest A", ""],
+            ["Candidate", "Votes"],
+            ["x", "10"],
+            ["y", "5"],
+            ["", ""],
+            ["Contest B", ""],
+            ["z", "7"],
+        ]
+    )
+    df_list, row_constants, err = m.extract_blocks(df, [0], "t", "f.xlsx", "s")
+    assert not ui.fatal_error(err), err
+    assert [list(block.index) for block in df_list] == [[0, 1, 2, 3, 4], [5, 6]]
+    assert row_constants == {0: {0: "Contest A"}, 1: {0: "Contest B"}}
+
+    df_list, row_constants, err = m.extract_blocks(
+        df, [0], "t", "f.xlsx", "s", max_blocks=1
+    )
+    assert len(df_list) == 1
+
+    df_list, row_constants, err = m.extract_blocks(
+        pd.DataFrame(), [0], "t", "f.xlsx", "s"
+    )
+    assert df_list == [] and row_constants == {}
+    assert not ui.fatal_error(err)
@@ -0,0 +1,123 @@
+import json
+import os
+from pathlib import Path
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from electiondata import munge as m, nist, userinterface as ui
+
+tests_dir = Path(__file__).parents[1]
+data_dir = os.path.join(tests_dir, "000_data_for_pytest")
+mungers_dir = os.path.join(Path(__file__).parents[2], "src", "mungers")
+
+nist_file = os.path.join(data_dir, "nist_v2_wy20g.xml")
+ga_file = os.path.join(data_dir, "2020-General", "Georgia", "GA_detail_20201120_1237.xml")
+va_file = os.path.join(data_dir, "va_json_sample.json")
+
+
+def munger_params(munger_name: str) -> (str, dict):
+    munger_path = os.path.join(mungers_dir, f"{munger_name}.munger")
+    p, err = m.get_and_check_munger_params(munger_path)
+    assert not ui.fatal_error(err), f"Munger {munger_name} not read: {err}"
+    return munger_path, p
+
+
+def sorted_frame(df: pd.DataFrame) -> pd.DataFrame:
+    working = df[sorted(df.columns)]
+    return working.sort_values(list(working.columns)).reset_index(drop=True)
+
+
+def test_xml_streaming_matches_tree():
+    for munger_name, f_path in [("ga_xml", ga_file), ("nist_v2_xml", nist_file)]:
+        _, p = munger_params(munger_name)
+        driver = nist.xml_count_parse_info(p, ignore_namespace=True)
+        xml_path_info = nist.xml_string_path_info(p["munge_fields"], p["namespace"])
+        from_tree, err = nist.df_from_tree(
+            ET.parse(f_path),
+            xml_path_info=xml_path_info,
+            file_name=Path(f_path).name,
+            ns=p["namespace"],
+            **driver,
+        )
+        assert not ui.fatal_error(err), err
+        streamed, err = nist.df_from_xml_file(
+            f_path,
+            xml_path_info=xml_path_info,
+            file_name=Path(f_path).name,
+            ns=p["namespace"],
+            rows_per_chunk=1000,
+            **driver,
+        )
+        assert not ui.fatal_error(err), err
+        assert not streamed.empty
+        pd.testing.assert_frame_equal(sorted_frame(streamed), sorted_frame(from_tree))
+
+
+def test_nist_v2_xml_munge():
+    munger_path, p = munger_params("nist_v2_xml")
+    df, err = m.file_to_raw_df(munger_path, p, nist_file, data_dir)
+    assert not ui.fatal_error(err), err
+    assert df.shape[0] == 5290
+
+
+def test_ga_xml_munge():
+    munger_path, p = munger_params("ga_xml")
+    df, err = m.file_to_raw_df(munger_path, p, ga_file, str(Path(ga_file).parent))
+    assert not ui.fatal_error(err), err
+    assert not df.empty
+    assert df["Count"].notnull().all()
+
+
+def test_json_reading_matches_normalize():
+    _, p = munger_params("va_json")
+    df = ui.df_from_json_file(
+        va_file, p["munge_fields"], p["count_location"], "Count"
+    )
+    j_kwargs, rename = ui.json_kwargs(
+        p["munge_fields"], p["count_location"], "Count"
+    )
+    with open(va_file, "r") as f:
+        data = json.load(f)
+    normalized = pd.json_normalize(data, **j_kwargs).rename(columns=rename)
+    assert df.shape[0] == 6
+    pd.testing.assert_frame_equal(
+        sorted_frame(df), sorted_frame(normalized[list(df.columns)])
+    )
+
+
+def test_va_json_munge():
+    munger_path, p = munger_params("va_json")
+    df, err = m.file_to_raw_df(munger_path, p, va_file, data_dir)
+    assert not ui.fatal_error(err), err
+    assert df.shape[0] == 6
+    assert df["Count"].sum() == 9434 + 7642 + 39 + 8610 + 7481 + 32
+
+
+def test_results_content_hash(tmp_path):
+    results = tmp_path / "results.txt"
+    results.write_text("a,1\nb,2\n")
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("cdf_element\tcdf_internal_name\traw_identifier_value\n")
+    munger_paths = [os.path.join(mungers_dir, "va_json.munger")]
+
+    first = ui.results_content_hash(str(results), munger_paths, str(dictionary))
+    assert first is not None
+    # same contents, same hash
+    assert first == ui.results_content_hash(
+        str(results), munger_paths, str(dictionary)
+    )
+    copy = tmp_path / "copy.txt"
+    copy.write_bytes(results.read_bytes())
+    assert first == ui.results_content_hash(str(copy), munger_paths, str(dictionary))
+    # order of files matters
+    paths = [str(results), str(dictionary)]
+    assert ui.file_content_hash(paths) != ui.file_content_hash(paths[::-1])
+    # changed contents, changed hash
+    results.write_text("a,1\nb,3\n")
+    assert first != ui.results_content_hash(
+        str(results), munger_paths, str(dictionary)
+    )
+    # unreadable file
+    missing = str(tmp_path / "missing.txt")
+    assert ui.results_content_hash(missing, munger_paths, str(dictionary)) is None